@@ -1,12 +1,32 @@
 #!/usr/bin/env python3
 
+from concurrent.futures import ThreadPoolExecutor
+import copy
 from datetime import datetime
+import threading
+import time
 import yaml
 
+from client import EXECUTOR, Client, to_thread
 from client_factory import ClientFactory
 from config import Config
+import eviction
+from reservations import Pending, ReservationLedger
+from snapshot_cache import SnapshotCache
+from snapshot import Snapshot
+from snapshot_index import SnapshotIndex
+from torrent import Torrent
 from tracker import Tracker
 from logger import Logger
+from metrics import (
+    ADMISSIONS,
+    CHECK_SECONDS,
+    FETCH_SECONDS,
+    FREED_BYTES,
+    MANAGE_PHASE_SECONDS,
+    SNAPSHOTS,
+    TORRENTS_EVALUATED,
+)
 
 
 class Application:
@@ -14,10 +34,256 @@ class Application:
         with open(config_path, "r", encoding="utf-8") as f:
             config = yaml.safe_load(f)
         self.config = Config(config)
-        self.logger = Logger(self.config.log_path)
+        self.logger = Logger(
+            self.config.log_path,
+            self.config.logging.get("format", "text"),
+            self.config.logging.get("echo", True),
+            int(self.config.logging.get("max_size_mb", 0) * (1 << 20)),
+            self.config.logging.get("backups", 3),
+        )
+        self.client_factory = ClientFactory(self.config.clients)
+        self.trackers = {
+            name: Tracker(name, tracker_config)
+            for name, tracker_config in self.config.trackers.items()
+        }
+        self.clients: dict[str, Client] = {}
+        self.clients_lock = threading.Lock()
+        # refreshes stale snapshots and records fetched ones, off the checks' path
+        self.worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="snapshots")
+        self.snapshots = SnapshotCache(self.worker)
+        self.reservations = ReservationLedger()
+        # client -> infohash -> torrent, evictions in progress (guarded by reservations.lock)
+        self.evictions: dict[str, dict[str, Torrent]] = {}
+        self.state = None
+        # snapshots and reservations live in the state database, for every process on the host
+        self.shared = False
+        if self.config.state.get("path"):
+            from state import SharedReservationLedger, StateStore
+
+            self.state = StateStore(
+                self.config.state["path"],
+                self.config.state.get("sample_interval_seconds", 300),
+                self.config.state.get("rate_window_seconds", 1800),
+                self.config.state.get("retention_days", 7) * 86400,
+            )
+            if self.config.state.get("shared", False):
+                self.shared = True
+                self.reservations = SharedReservationLedger(self.state)
+            self._warm_start()
+
+    def client(self, name: str) -> Client:
+        """Get the long-lived client instance, creating it on first use."""
+        with self.clients_lock:
+            client = self.clients.get(name)
+            if client is None:
+                client = self.clients[name] = self.client_factory.create(name)
+            return client
+
+    def _warm_start(self):
+        """Seed the snapshot cache with the last recorded snapshot of every client.
+
+        Only clients serving stale snapshots use them, while their first refresh runs.
+        """
+        for name, client_config in self.config.clients.items():
+            # checked before creating the client so unused backends aren't imported
+            if client_config.get("stale_seconds", 0) <= 0:
+                continue
+            last = self.state.last_snapshot(name)
+            if last is not None:
+                client = self.client(name)
+                fetched_at, torrents = last
+                self.snapshots.seed(
+                    name,
+                    self._index(client, torrents, fetched_at),
+                    time.time() - fetched_at,
+                )
+
+    def _index(self, client: Client, torrents: Snapshot, now: float) -> SnapshotIndex:
+        if self.state is not None and client.smooth_rates:
+            self.state.smooth(client.name, torrents, now)
+        index = SnapshotIndex(client, torrents, list(self.trackers.values()))
+        index.fetched_at = now
+        return index
+
+    def _indexed(self, client: Client, torrents: Snapshot, now: float) -> SnapshotIndex:
+        """Reconcile, record and index a snapshot listed at epoch time now."""
+        SNAPSHOTS.inc(client=client.name, source="fetched")
+        self.reservations.reconcile(client.name, torrents, now)
+        if self.state is not None and self.shared and client.snapshot_ttl > 0:
+            # published right away, other processes wait for it under the fetch lock
+            self.state.record(client.name, torrents, now, publish=True)
+        elif self.state is not None:
+            # a shallow copy, as smoothing replaces the rate columns it records
+            self.worker.submit(self._record, client.name, copy.copy(torrents), now)
+        index = self._index(client, torrents, now)
+        TORRENTS_EVALUATED.inc(
+            sum(len(stats.rows) for stats in index.trackers.values()),
+            client=client.name,
+        )
+        return index
+
+    def _record(self, client_name: str, torrents: Snapshot, now: float):
+        try:
+            self.state.record(client_name, torrents, now)
+        except Exception as e:
+            self.logger.log(
+                f"Recording the snapshot of {client_name} failed: {e}",
+                event="record_failed",
+                client=client_name,
+            )
+
+    def _shared_snapshot(self, client: Client) -> SnapshotIndex | None:
+        """Index the snapshot another process listed within the client's TTL, if any."""
+        if client.snapshot_ttl <= 0:
+            return None
+        shared = self.state.fresh_snapshot(client.name, client.snapshot_ttl)
+        if shared is None:
+            return None
+        fetched_at, torrents = shared
+        SNAPSHOTS.inc(client=client.name, source="shared")
+        index = self._index(client, torrents, fetched_at)
+        index.age = time.time() - fetched_at
+        return index
+
+    def _list_snapshot(self, client: Client) -> SnapshotIndex:
+        # stamped at the start so invalidations during the listing win
+        now = time.time()
+        with FETCH_SECONDS.time(backend=client.config["type"]):
+            torrents = client.list_torrents()
+        return self._indexed(client, torrents, now)
+
+    def _fetch_snapshot(self, client: Client) -> SnapshotIndex:
+        if not self.shared:
+            return self._list_snapshot(client)
+        # one process lists the client per TTL, the others wait for its snapshot
+        with self.state.host_lock(f"fetch:{client.name}"):
+            index = self._shared_snapshot(client)
+            return index if index is not None else self._list_snapshot(client)
+
+    def _drop_invalidated(self, client: Client):
+        """Drop the cached snapshot if another process invalidated the client since."""
+        if not self.shared:
+            return
+        index = self.snapshots.peek(client.name)
+        if index is None:
+            return
+        if index.fetched_at < self.state.invalidated_at(client.name):
+            self.snapshots.invalidate(client.name)
+
+    def snapshot(self, client: Client) -> SnapshotIndex:
+        """Get the client's indexed snapshot through the shared snapshot cache."""
+        self._drop_invalidated(client)
+        return self.snapshots.get(
+            client.name,
+            lambda: self._fetch_snapshot(client),
+            client.snapshot_ttl,
+            client.stale_seconds,
+        )
+
+    async def _list_snapshot_async(self, client: Client) -> SnapshotIndex:
+        now = time.time()
+        with FETCH_SECONDS.time(backend=client.config["type"]):
+            torrents = await client.list_torrents_async()
+        # reconciling, recording and indexing hit SQLite and walk every row
+        return await to_thread(self._indexed, client, torrents, now)
+
+    async def _fetch_snapshot_async(self, client: Client) -> SnapshotIndex:
+        if not self.shared:
+            return await self._list_snapshot_async(client)
+        import asyncio
+
+        lock = self.state.host_lock(f"fetch:{client.name}")
+        while not lock.acquire(blocking=False):
+            await asyncio.sleep(0.05)  # polled so the event loop keeps running
+        try:
+            index = await to_thread(self._shared_snapshot, client)
+            if index is None:
+                index = await self._list_snapshot_async(client)
+            return index
+        finally:
+            lock.release()
+
+    async def snapshot_async(self, client: Client) -> SnapshotIndex:
+        if self.shared:
+            await to_thread(self._drop_invalidated, client)
+        return await self.snapshots.get_async(
+            client.name,
+            lambda: self._fetch_snapshot_async(client),
+            client.snapshot_ttl,
+        )
+
+    def invalidate(self, client_name: str):
+        """Drop a client's cached snapshot, in every process when state is shared."""
+        self.snapshots.invalidate(client_name)
+        if self.shared:
+            self.state.invalidate(client_name)
 
     def check(self, client_name: str, tracker_name: str, size: int) -> tuple[bool, str]:
         """Check if a torrent can be added to the specified tracker."""
+        with CHECK_SECONDS.time(phase="total"):
+            tracker, client = self._check_target(client_name, tracker_name, size)
+            with CHECK_SECONDS.time(phase="fetch"):
+                index = self.snapshot(client)
+            ok, _, err = self._admit(client, tracker, size, index)
+            return ok, err
+
+    async def check_async(
+        self, client_name: str, tracker_name: str, size: int
+    ) -> tuple[bool, str]:
+        with CHECK_SECONDS.time(phase="total"):
+            tracker, client = self._check_target(client_name, tracker_name, size)
+            with CHECK_SECONDS.time(phase="fetch"):
+                index = await self.snapshot_async(client)
+            # the ledger's locks and SQLite, and evicting, block
+            ok, _, err = await to_thread(self._admit, client, tracker, size, index)
+            return ok, err
+
+    def check_batch(self, candidates: list[dict]) -> list[tuple[bool, str, str]]:
+        """Check candidates ({client, tracker, size}) in order against one snapshot per client.
+
+        Each accepted candidate takes up capacity for those after it, through its
+        reservation or, without reservations, for the rest of the batch.
+        Returns (accepted, reason, message) per candidate, invalid ones get reason "invalid".
+        """
+        indices: dict[str, SnapshotIndex] = {}
+        # accepted in this batch without a reservation: client -> bytes, (client, tracker) -> Pending
+        client_sizes: dict[str, int] = {}
+        tracker_pending: dict[tuple[str, str], Pending] = {}
+        results = []
+        with CHECK_SECONDS.time(phase="batch"):
+            for candidate in candidates:
+                try:
+                    if not isinstance(candidate, dict):
+                        raise ValueError("Candidates must be objects.")
+                    size = candidate.get("size")
+                    if not isinstance(size, int) or isinstance(size, bool):
+                        raise ValueError("Size must be a positive integer.")
+                    tracker, client = self._check_target(
+                        candidate.get("client"), candidate.get("tracker"), size
+                    )
+                except ValueError as e:
+                    results.append((False, "invalid", str(e)))
+                    continue
+                index = indices.get(client.name)
+                if index is None:
+                    with CHECK_SECONDS.time(phase="fetch"):
+                        index = indices[client.name] = self.snapshot(client)
+                key = (client.name, tracker.name)
+                batched = tracker_pending.get(key, Pending())
+                extra = Pending(client_sizes.get(client.name, 0)) + batched
+                ok, reason, err = self._admit(client, tracker, size, index, extra)
+                if reason in ("evicted", "eviction_failed"):
+                    del indices[client.name]  # refetch without the removed torrents
+                if ok and client.reservation_ttl <= 0:
+                    client_sizes[client.name] = client_sizes.get(client.name, 0) + size
+                    tracker_pending[key] = batched + Pending(0, size, 1)
+                results.append((ok, reason, err))
+        return results
+
+    def _check_target(
+        self, client_name: str, tracker_name: str, size: int
+    ) -> tuple[Tracker, Client]:
+        """Validate check arguments, get the tracker and client they refer to."""
         if not client_name:
             raise ValueError("Client name is required.")
         if not tracker_name:
@@ -34,60 +300,253 @@ Available clients: {','.join(self.config.clients.keys())}"""
                 f"""Unknown tracker: {tracker_name}.
 Available trackers: {','.join(self.config.trackers.keys())}"""
             )
-        tracker = Tracker(tracker_name, self.config.trackers[tracker_name])
-        client = ClientFactory(self.config.clients).create(client_name)
-        ok, err = tracker.can_accept(client, size)
+        return self.trackers[tracker_name], self.client(client_name)
+
+    def _admit(
+        self,
+        client: Client,
+        tracker: Tracker,
+        size: int,
+        index: SnapshotIndex,
+        extra: Pending | None = None,
+    ) -> tuple[bool, str, str]:
+        """Evaluate, reserve and evict for a check. Returns success, reason and message.
+
+        Capacity in extra is held on top of the ledger's reservations.
+        """
+        client_name, tracker_name = client.name, tracker.name
+        evict = []
+        reservation = None
+        # settled reservations count while a snapshot in use predates them
+        as_of = index.fetched_at
+        cached = self.snapshots.peek(client_name)
+        if cached is not None:
+            as_of = min(as_of, cached.fetched_at)
+        # evaluate and reserve atomically so concurrent checks see each other's approvals
+        with CHECK_SECONDS.time(phase="evaluate"), self.reservations.lock:
+            evicting = self.evictions.setdefault(client_name, {})
+            pending = eviction.credit(
+                self.reservations.pending(client_name, tracker_name, as_of),
+                list(evicting.values()),
+                tracker,
+            )
+            if extra is not None:
+                pending = pending + extra
+            ok, reason, err = tracker.admit(client, size, index, pending)
+            if not ok and client.evict_on_demand:
+                evict = eviction.plan(
+                    index,
+                    client,
+                    tracker,
+                    list(self.trackers.values()),
+                    size,
+                    pending,
+                    set(evicting),
+                )
+                if evict:
+                    credited = eviction.credit(pending, evict, tracker)
+                    ok, _, msg = tracker.admit(client, size, index, credited)
+                    if ok:
+                        reason, err = "evicted", msg
+                        evicting.update((t.infohash, t) for t in evict)
+                    else:
+                        evict = []
+            if ok and client.reservation_ttl > 0:
+                reservation = self.reservations.reserve(
+                    client_name,
+                    tracker_name,
+                    tracker.label,
+                    size,
+                    client.reservation_ttl,
+                )
+        if evict:
+            with CHECK_SECONDS.time(phase="evict"):
+                ok, err = self._evict(client, evict)
+            if not ok:
+                reason = "eviction_failed"
+                if reservation is not None:  # the torrent won't be added
+                    self.reservations.release(reservation)
+        ADMISSIONS.inc(result="accepted" if ok else "rejected", reason=reason)
         self.logger.log(
-            f"Ingress check (client={client_name}, tracker={tracker_name}, size={size / (1 <<30 ):.02f} GiB): {err}"
+            f"Ingress check (client={client_name}, tracker={tracker_name}, size={size / (1 <<30 ):.02f} GiB): {err}",
+            event="check",
+            client=client_name,
+            tracker=tracker_name,
+            size=size,
+            accepted=ok,
+            reason=reason,
         )
-        return ok, err
-
-    def manage(self, delete: bool = False):
-        """List + optionally delete torrents."""
-        for name in self.config.clients:
-            client = ClientFactory(self.config.clients).create(name)
-            client_torrents = client.filter(client.list_torrents())
-            client_size_gb = sum(t.size for t in client_torrents) / (1 << 30)
-            client_ratio = sum(t.uploaded for t in client_torrents) / (
-                sum(t.downloaded for t in client_torrents) or 1
-            )
-            client_down_mbps = sum(t.down_rate for t in client_torrents) * 8 / 1e6
-            client_up_mbps = sum(t.up_rate for t in client_torrents) * 8 / 1e6
-            self.logger.log(
-                f"Client: {name} ({len(client_torrents)} torrents, {client_size_gb:.02f} GiB, {client_ratio * 100:.0f}% ratio, ↓{client_down_mbps:.02f} Mbps, ↑{client_up_mbps:.02f} Mbps)"
+        return ok, reason, err
+
+    def _evict(self, client: Client, torrents: list[Torrent]) -> tuple[bool, str]:
+        """Remove torrents planned for eviction by a check."""
+        try:
+            removed = client.remove_torrents(torrents)
+        except Exception as e:
+            return False, f"Eviction failed: {e}"
+        finally:
+            self.invalidate(client.name)
+            with self.reservations.lock:
+                evicting = self.evictions[client.name]
+                for torrent in torrents:
+                    evicting.pop(torrent.infohash, None)
+        freed = sum(t.size for t in torrents if removed.get(t.infohash))
+        FREED_BYTES.inc(freed, client=client.name, cause="eviction")
+        self.logger.log(
+            f"Evicted {sum(removed.values())}/{len(torrents)} torrents ({freed / (1 << 30):.02f} GiB) from {client.name}: "
+            + ", ".join(t.name for t in torrents),
+            event="evict",
+            client=client.name,
+            infohashes=[t.infohash for t in torrents if removed.get(t.infohash)],
+            freed=freed,
+        )
+        return True, "OK"
+
+    def manage(
+        self, delete: bool = False, clients: list[str] | None = None
+    ) -> dict[str, SnapshotIndex]:
+        """List + optionally delete torrents.
+
+        Blocking client calls run on an executor of this run, which isn't waited
+        for at the end, so a call hung past its client's timeout can't hold it up.
+        """
+        import asyncio  # not imported globally as the check CLI doesn't need it
+        from concurrent.futures import ThreadPoolExecutor
+
+        executor = ThreadPoolExecutor(thread_name_prefix="manage")
+        token = EXECUTOR.set(executor)
+        try:
+            return asyncio.run(self.manage_async(delete, clients))
+        finally:
+            EXECUTOR.reset(token)
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    async def manage_async(
+        self, delete: bool = False, clients: list[str] | None = None
+    ) -> dict[str, SnapshotIndex]:
+        """List + optionally delete torrents of the given clients, all by default.
+
+        Clients are processed concurrently, each one's log lines are emitted as blocks.
+        Returns the snapshot each managed client was evaluated on.
+        """
+        import asyncio
+
+        semaphore = asyncio.Semaphore(self.config.manage.get("workers", 4))
+        clients = [self.client(name) for name in clients or self.config.clients]
+        indices = {}
+
+        async def run(client: Client):
+            cancelled = threading.Event()
+            async with semaphore:
+                try:
+                    indices[client.name] = await asyncio.wait_for(
+                        self._manage_client(client, delete, cancelled),
+                        client.manage_timeout or None,
+                    )
+                except asyncio.TimeoutError:
+                    self.logger.log(
+                        f"Client: {client.name} timed out after {client.manage_timeout}s, skipping."
+                    )
+                except Exception as e:
+                    self.logger.log(f"Client: {client.name} failed: {e}")
+                finally:
+                    # cancelling the coroutine doesn't stop a deletion running on a thread
+                    cancelled.set()
+
+        try:
+            await asyncio.gather(*(run(client) for client in clients))
+        finally:
+            for client in clients:
+                await client.aclose()
+        return indices
+
+    async def _manage_client(
+        self, client: Client, delete: bool, cancelled: threading.Event | None = None
+    ) -> SnapshotIndex:
+        """List + optionally delete torrents of a single client.
+
+        Deleting stops between chunks once cancelled is set.
+        """
+        name = client.name
+        logger = self.logger.buffer()
+        try:
+            with MANAGE_PHASE_SECONDS.time(phase="fetch"):
+                self.invalidate(name)  # manage always works on fresh data
+                index = await self.snapshot_async(client)
+            evaluating = time.perf_counter()
+            stats = index.client
+            logger.log(
+                f"Client: {name} ({len(stats.torrents)} torrents, {stats.size / (1 << 30):.02f} GiB, {stats.ratio() * 100:.0f}% ratio, ↓{stats.down_rate * 8 / 1e6:.02f} Mbps, ↑{stats.up_rate * 8 / 1e6:.02f} Mbps)"
             )
-            for tracker_name in self.config.trackers:
-                tracker = Tracker(tracker_name, self.config.trackers[tracker_name])
-                if not tracker.enabled:
-                    continue
-                tracker_torrents = tracker.filter_torrents(client, client_torrents)
-                to_delete = [
-                    t
-                    for t in tracker_torrents
-                    if tracker.is_faulted(client, t)
-                    or (tracker.is_satisfied(t) and client.is_satisfied(t))
+            trackers = [
+                tracker for tracker in self.trackers.values() if tracker.enabled
+            ]
+            # look up tracker status in one batch, only where errors can be cleared
+            lookups = client.tracker_lookups
+            await client.load_tracker_errors_async(
+                [
+                    torrent
+                    for tracker in trackers
+                    if tracker.clear_errors
+                    for torrent in index.trackers[tracker.name].torrents
                 ]
-                size_torrents_gb = sum(t.size for t in tracker_torrents) / (1 << 30)
-                size_sat_gb = sum(t.size for t in to_delete) / (1 << 30)
-                tracker_ratio = sum(t.uploaded for t in tracker_torrents) / (
-                    sum(t.downloaded for t in tracker_torrents) or 1
-                )
-                tracker_down_mbps = sum(t.down_rate for t in tracker_torrents) * 8 / 1e6
-                tracker_up_mbps = sum(t.up_rate for t in tracker_torrents) * 8 / 1e6
-                self.logger.log(
-                    f"Tracker: {tracker_name} ({len(to_delete)}/{len(tracker_torrents)} | {size_sat_gb:.02f}/{size_torrents_gb:.02f} GiB to delete, {tracker_ratio * 100:.0f}% ratio, ↓{tracker_down_mbps:.02f} Mbps, ↑{tracker_up_mbps:.02f} Mbps)"
+            )
+            client_to_delete = {}
+            for tracker in trackers:
+                stats = index.trackers[tracker.name]
+                to_delete = []  # (torrent, is_faulted)
+                for torrent, satisfied in zip(stats.torrents, stats.satisfied):
+                    is_faulted = tracker.is_faulted(client, torrent)
+                    if is_faulted or (satisfied and client.is_satisfied(torrent)):
+                        to_delete.append((torrent, is_faulted))
+                size_sat_gb = sum(t.size for t, _ in to_delete) / (1 << 30)
+                logger.log(
+                    f"Tracker: {tracker.name} ({len(to_delete)}/{len(stats.torrents)} | {size_sat_gb:.02f}/{stats.size / (1 << 30):.02f} GiB to delete, {stats.ratio() * 100:.0f}% ratio, ↓{stats.down_rate * 8 / 1e6:.02f} Mbps, ↑{stats.up_rate * 8 / 1e6:.02f} Mbps)"
                 )
-                for torrent in to_delete:
+                for torrent, is_faulted in to_delete:
                     age_hours = (
                         (datetime.now() - torrent.finished_at).total_seconds() / 3600
                         if torrent.finished_at
                         else 0
                     )
-                    is_faulted = tracker.is_faulted(client, torrent)
                     msg = "ERR" if is_faulted else "SAT"
                     msg = f"{msg}: {torrent.name}, {torrent.size / (1 << 30):.02f}GiB, {age_hours:.02f}h, {torrent.ratio() * 100:.0f}%, ↓{torrent.down_rate * 8 / 1e6:.02f} Mbps, ↑{torrent.up_rate * 8 / 1e6:.02f} Mbps"
                     if is_faulted:
                         msg += f", [{torrent.tracker_error}]"
-                    self.logger.log(msg)
-                    if delete:
-                        client.remove_torrent(torrent)
+                    logger.log(
+                        msg,
+                        event="satisfied",
+                        client=name,
+                        tracker=tracker.name,
+                        infohash=torrent.infohash,
+                        size=torrent.size,
+                        faulted=is_faulted,
+                    )
+                    client_to_delete[torrent.infohash] = torrent
+            if client.tracker_lookups > lookups:
+                logger.log(f"Tracker lookups: {client.tracker_lookups - lookups}")
+            MANAGE_PHASE_SECONDS.observe(
+                time.perf_counter() - evaluating, phase="evaluate"
+            )
+            logger.flush()
+            if delete and client_to_delete:
+
+                def progress(removed: dict[str, bool]):
+                    logger.log(
+                        f"Removed {sum(removed.values())} torrents ({len(removed)}/{len(client_to_delete)} processed)."
+                    )
+                    logger.flush()
+
+                with MANAGE_PHASE_SECONDS.time(phase="delete"):
+                    removed = await client.remove_torrents_async(
+                        list(client_to_delete.values()), progress, cancelled
+                    )
+                FREED_BYTES.inc(
+                    sum(t.size for h, t in client_to_delete.items() if removed.get(h)),
+                    client=name,
+                    cause="manage",
+                )
+                self.invalidate(name)
+            return index
+        finally:
+            logger.flush()
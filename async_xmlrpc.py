@@ -0,0 +1,184 @@
+import asyncio
+import base64
+import ssl
+import urllib.parse
+import weakref
+import xmlrpc.client
+
+from metrics import RPCS
+from scgi import SCGITransport
+
+
+class _Pool:
+    """Idle keep-alive connections of one event loop, and a cap on those in use."""
+
+    def __init__(self, size: int):
+        self.idle: list[tuple[asyncio.StreamReader, asyncio.StreamWriter]] = []
+        self.semaphore = asyncio.Semaphore(size)
+
+
+class AsyncXMLRPC:
+    """XML-RPC client on asyncio streams, for http(s):// and scgi:// URLs.
+
+    HTTP connections are kept alive and pooled per event loop, at most pool_size at once.
+    SCGI opens a connection per call like SCGITransport does.
+    """
+
+    def __init__(self, url: str, timeout: float | None = None, pool_size: int = 10):
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.pools: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _Pool] = (
+            weakref.WeakKeyDictionary()
+        )
+        parsed = urllib.parse.urlsplit(url)
+        self.scheme = parsed.scheme
+        self.authorization = None
+        if self.scheme == "scgi":
+            self.address = SCGITransport.from_url(url).address
+            self.path = "/RPC2"
+        elif self.scheme in ("http", "https"):
+            default_port = 443 if self.scheme == "https" else 80
+            self.address = (parsed.hostname, parsed.port or default_port)
+            self.host = parsed.netloc.rpartition("@")[2]
+            self.path = parsed.path or "/RPC2"
+            if parsed.query:
+                self.path += f"?{parsed.query}"
+            if parsed.username is not None:
+                credentials = urllib.parse.unquote(
+                    f"{parsed.username}:{parsed.password or ''}"
+                )
+                self.authorization = base64.b64encode(credentials.encode()).decode()
+        else:
+            raise ValueError(f"Unsupported XML-RPC URL: {url}")
+
+    @property
+    def pool(self) -> _Pool:
+        loop = asyncio.get_running_loop()
+        pool = self.pools.get(loop)
+        if pool is None:
+            pool = self.pools[loop] = _Pool(self.pool_size)
+        return pool
+
+    async def call(self, method: str, *params, parser=None):
+        """Call a remote method and return its result. Faults raise xmlrpc.client.Fault.
+
+        A parser with feed() and close(), such as MulticallParser, replaces unmarshalling.
+        """
+        body = xmlrpc.client.dumps(params, method).encode()
+        RPCS.inc(backend="rtorrent", method=method)
+        pool = self.pool
+        async with pool.semaphore:
+            if self.scheme == "scgi":
+                request = self._scgi_request(body)
+            else:
+                request = self._http_request(pool, body)
+            response = await asyncio.wait_for(request, self.timeout)
+        if parser is None:
+            result, _ = xmlrpc.client.loads(response)
+        else:
+            parser.feed(response)
+            result = parser.close()
+        return result[0]
+
+    async def aclose(self):
+        """Close the idle connections of the running loop."""
+        pool = self.pools.pop(asyncio.get_running_loop(), None)
+        if pool is None:
+            return
+        for _, writer in pool.idle:
+            writer.close()
+        pool.idle.clear()
+
+    async def _scgi_request(self, body: bytes) -> bytes:
+        if isinstance(self.address, str):
+            reader, writer = await asyncio.open_unix_connection(self.address)
+        else:
+            reader, writer = await asyncio.open_connection(*self.address)
+        try:
+            writer.write(SCGITransport.encode(body, self.path))
+            await writer.drain()
+            status = 200
+            while line := (await reader.readline()).strip():
+                name, _, value = line.partition(b":")
+                if name.strip().lower() == b"status":
+                    status = int(value.split()[0])
+            if status != 200:
+                raise xmlrpc.client.ProtocolError(
+                    f"scgi:{self.address}", status, "SCGI request failed", {}
+                )
+            return await reader.read()
+        finally:
+            writer.close()
+
+    async def _http_request(self, pool: _Pool, body: bytes) -> bytes:
+        headers = [
+            f"POST {self.path} HTTP/1.1",
+            f"Host: {self.host}",
+            "Content-Type: text/xml",
+            f"Content-Length: {len(body)}",
+        ]
+        if self.authorization:
+            headers.append(f"Authorization: Basic {self.authorization}")
+        request = ("\r\n".join(headers) + "\r\n\r\n").encode() + body
+        while True:
+            reused = bool(pool.idle)
+            if reused:
+                reader, writer = pool.idle.pop()
+            else:
+                reader, writer = await self._connect()
+            try:
+                writer.write(request)
+                await writer.drain()
+                status, keep_alive, response = await self._read_response(reader)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                writer.close()
+                if reused:  # the server dropped an idle connection, try another one
+                    continue
+                raise
+            except BaseException:
+                writer.close()
+                raise
+            if keep_alive:
+                pool.idle.append((reader, writer))
+            else:
+                writer.close()
+            if status != 200:
+                raise xmlrpc.client.ProtocolError(
+                    f"{self.host}{self.path}", status, "HTTP request failed", {}
+                )
+            return response
+
+    async def _connect(self) -> tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        if self.scheme == "https":
+            return await asyncio.open_connection(
+                *self.address, ssl=ssl.create_default_context()
+            )
+        return await asyncio.open_connection(*self.address)
+
+    @staticmethod
+    async def _read_response(reader: asyncio.StreamReader) -> tuple[int, bool, bytes]:
+        """Read an HTTP/1.x response. Returns (status, keep-alive, body)."""
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError("Connection closed before the response.")
+        version, status, _ = status_line.decode("latin-1").split(" ", 2)
+        headers = {}
+        while line := (await reader.readline()).strip():
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        connection = headers.get("connection", "").lower()
+        keep_alive = connection != "close" and (
+            version != "HTTP/1.0" or connection == "keep-alive"
+        )
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while size := int((await reader.readline()).split(b";")[0], 16):
+                chunks.append(await reader.readexactly(size))
+                await reader.readline()
+            while (await reader.readline()).strip():  # trailers
+                pass
+            return int(status), keep_alive, b"".join(chunks)
+        if "content-length" in headers:
+            body = await reader.readexactly(int(headers["content-length"]))
+            return int(status), keep_alive, body
+        return int(status), False, await reader.read()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""Check latency with long-lived clients versus a fresh client per check.
+
+Runs against a local fake rTorrent whose new connections pay a simulated handshake.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from application import Application  # noqa: E402
+from benchmarks.fakes import (  # noqa: E402
+    FakeRTorrent,
+    synthetic_torrents,
+    write_config,
+)
+from benchmarks.run import latencies  # noqa: E402
+
+TRACKERS = ["aither", "tl", "mam"]
+
+
+def measure(app: Application, checks: int) -> list[float]:
+    values = []
+    for i in range(checks):
+        start = time.perf_counter()
+        app.check("rtorrent_1", TRACKERS[i % len(TRACKERS)], 1 << 30)
+        values.append(time.perf_counter() - start)
+    return values
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--torrents", type=int, default=1000)
+    parser.add_argument("--checks", type=int, default=200)
+    parser.add_argument("--handshake-ms", type=float, default=5)
+    args = parser.parse_args()
+
+    torrents = synthetic_torrents(args.torrents, TRACKERS, ["automated"])
+    fake = FakeRTorrent(torrents, handshake_delay=args.handshake_ms / 1000).start()
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            app = Application(
+                write_config(
+                    directory,
+                    {"rtorrent_1": {"type": "rtorrent", "url": fake.url}},
+                    TRACKERS,
+                    {"clients": {"snapshot_ttl_seconds": 0, "storage_cap_gb": 1 << 20}},
+                )
+            )
+            reused = measure(app, args.checks)
+            # the pre-registry behaviour: a brand new client for every check
+            app.client = app.client_factory.create
+            fresh = measure(app, args.checks)
+    finally:
+        fake.stop()
+    for name, values in (("reused", reused), ("fresh", fresh)):
+        result = latencies(values)
+        print(
+            f"{name:>6}: p50 {result['p50_ms']:.02f} ms, p99 {result['p99_ms']:.02f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""Eviction planning time on a large client snapshot, for growing amounts of space needed."""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+import eviction  # noqa: E402
+from benchmarks.snapshot_memory import build_snapshot  # noqa: E402
+from benchmarks.fakes import synthetic_torrents  # noqa: E402
+from reservations import Pending  # noqa: E402
+from rtorrent import RTorrentClient  # noqa: E402
+from snapshot_index import SnapshotIndex  # noqa: E402
+from tracker import Tracker  # noqa: E402
+
+TRACKERS = ["aither", "tl", "mam"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--torrents", type=int, default=20000)
+    parser.add_argument("--runs", type=int, default=50)
+    args = parser.parse_args()
+
+    snapshot = build_snapshot(
+        synthetic_torrents(args.torrents, TRACKERS, ["automated"])
+    )
+    trackers = [
+        Tracker(
+            label,
+            {
+                "label": label,
+                "requirements": [{"min_seed_hours": 72}],
+                "storage_cap_gb": 1 << 20,
+            },
+        )
+        for label in TRACKERS
+    ]
+    total = sum(snapshot.size)
+    for share in (0.001, 0.01, 0.1, 0.5):
+        client = RTorrentClient(
+            "rtorrent_1",
+            {
+                "url": "http://localhost/RPC2",
+                "storage_cap_gb": total * (1 - share) / (1 << 30),
+                "required_labels": ["automated"],
+            },
+        )
+        index = SnapshotIndex(client, snapshot, trackers)
+        timings = []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            planned = eviction.plan(
+                index, client, trackers[0], trackers, 1 << 30, Pending()
+            )
+            timings.append(time.perf_counter() - start)
+        p = statistics.quantiles(timings, n=100, method="inclusive")
+        print(
+            f"free {share * 100:>5.01f}%: {len(planned):>5} evicted, "
+            f"p50 {p[49] * 1000:.02f} ms, p99 {p[98] * 1000:.02f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
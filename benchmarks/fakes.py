@@ -0,0 +1,467 @@
+"""In-process stand-ins for torrent client backends."""
+
+import json
+import os
+import random
+import socketserver
+import threading
+import time
+import urllib.parse
+import xmlrpc.client
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from xmlrpc.server import SimpleXMLRPCDispatcher, SimpleXMLRPCRequestHandler
+
+import yaml
+
+MULTICALL_FIELDS = {
+    "d.hash=": lambda t: t["hash"],
+    "d.name=": lambda t: t["name"],
+    "d.custom1=": lambda t: urllib.parse.quote(",".join(t["labels"])),
+    "d.timestamp.started=": lambda t: t["started"],
+    "d.timestamp.finished=": lambda t: t["finished"],
+    "d.size_bytes=": lambda t: t["size"],
+    "d.down.total=": lambda t: t["downloaded"],
+    "d.up.total=": lambda t: t["uploaded"],
+    "d.down.rate=": lambda t: t["down_rate"],
+    "d.up.rate=": lambda t: t["up_rate"],
+    "d.message=": lambda t: t["message"],
+    "d.is_open=": lambda t: "1",
+    "d.is_active=": lambda t: "1",
+}
+
+
+def write_config(
+    directory: str,
+    clients: dict[str, dict],
+    trackers: dict[str, dict] | list[str],
+    settings: dict | None = None,
+    name: str = "config.yaml",
+) -> str:
+    """Write a config for the given clients and trackers to directory, returns its path.
+
+    A list of trackers stands for trackers of those labels with a plain requirement.
+    The clients, trackers and server entries of the global settings extend the
+    defaults, others (state, logging, ...) are set as given. Logging doesn't echo
+    by default.
+    """
+    settings = settings or {}
+    if isinstance(trackers, list):
+        trackers = {
+            label: {"label": label, "requirements": [{"min_seed_hours": 72}]}
+            for label in trackers
+        }
+    config = {
+        "global": {
+            "log_path": os.path.join(directory, "log.txt"),
+            "logging": {"echo": False},
+            **settings,
+            "trackers": {
+                "seed_buffer_hours": 1,
+                "ratio_buffer": 0.5,
+                **settings.get("trackers", {}),
+            },
+            "clients": {
+                "required_labels": ["automated"],
+                **settings.get("clients", {}),
+            },
+            "server": {"host": "localhost", "port": 0, **settings.get("server", {})},
+        },
+        "clients": clients,
+        "trackers": trackers,
+    }
+    path = os.path.join(directory, name)
+    with open(path, "w", encoding="utf-8") as f:
+        yaml.safe_dump(config, f)
+    return path
+
+
+def synthetic_torrents(
+    count: int,
+    labels: list[str],
+    required: list[str],
+    seed: int = 0,
+    weights: list[float] | None = None,
+    error_rate: float = 0,
+    unmanaged_rate: float = 0,
+) -> list[dict]:
+    """Generate torrents spread over the given tracker labels.
+
+    Labels are assigned round robin, or at random in proportion to weights.
+    error_rate of the torrents carry a tracker error and unmanaged_rate of them
+    lack the required labels.
+    """
+    rng = random.Random(seed)
+    # separate stream so the defaults keep generating the same torrents
+    spread = random.Random(seed + 1)
+    now = int(time.time())
+    torrents = []
+    for i in range(count):
+        size = rng.randint(100 << 20, 50 << 30)
+        started = now - rng.randint(0, 30 * 86400)
+        finished = started + rng.randint(60, 3600) if rng.random() < 0.9 else 0
+        if weights is None:
+            label = labels[i % len(labels)]
+        else:
+            label = spread.choices(labels, weights)[0]
+        error = error_rate and spread.random() < error_rate
+        unmanaged = unmanaged_rate and spread.random() < unmanaged_rate
+        torrents.append(
+            {
+                "hash": f"{i:040X}",
+                "name": f"Synthetic.Torrent.{i}",
+                "labels": ([] if unmanaged else required) + [label],
+                "started": started,
+                "finished": finished,
+                "size": size,
+                "downloaded": size,
+                "uploaded": int(size * rng.random() * 3),
+                "down_rate": 0 if finished else rng.randint(0, 10 << 20),
+                "up_rate": rng.randint(0, 1 << 20),
+                "message": "Tracker: [Unregistered torrent]" if error else "",
+            }
+        )
+    return torrents
+
+
+class _I8Marshaller(xmlrpc.client.Marshaller):
+    """Marshaller that emits rTorrent's i8 for integers beyond 32 bits."""
+
+    dispatch = dict(xmlrpc.client.Marshaller.dispatch)
+
+    def dump_long(self, value, write):
+        tag = "int" if xmlrpc.client.MININT <= value <= xmlrpc.client.MAXINT else "i8"
+        write(f"<value><{tag}>{value}</{tag}></value>\n")
+
+    dispatch[int] = dump_long
+
+
+class _KeepAliveHandler(SimpleXMLRPCRequestHandler):
+    protocol_version = "HTTP/1.1"
+    rpc_paths = ()  # accept any path, e.g. /RPC2 or /scgi.php
+
+    def setup(self):
+        super().setup()
+        # models the TCP/TLS handshake cost of reaching a remote seedbox
+        time.sleep(self.server.handshake_delay)
+
+
+class _I8Dispatcher(SimpleXMLRPCDispatcher):
+    def _marshaled_dispatch(self, data, dispatch_method=None, path=None):
+        params, method = xmlrpc.client.loads(data)
+        try:
+            response = (self._dispatch(method, params),)
+        except xmlrpc.client.Fault as fault:
+            response = fault
+        body = _I8Marshaller(allow_none=True).dumps(response)
+        return f"<?xml version='1.0'?>\n<methodResponse>\n{body}</methodResponse>\n".encode()
+
+
+class _XMLRPCServer(ThreadingHTTPServer, _I8Dispatcher):
+    daemon_threads = True
+    logRequests = False
+
+    def __init__(self, addr, handshake_delay: float):
+        self.handshake_delay = handshake_delay
+        ThreadingHTTPServer.__init__(self, addr, _KeepAliveHandler)
+        _I8Dispatcher.__init__(self, allow_none=True, encoding=None)
+
+
+class _SCGIHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        length = b""
+        while (char := self.rfile.read(1)) != b":":
+            length += char
+        fields = self.rfile.read(int(length)).split(b"\0")
+        self.rfile.read(1)  # trailing comma of the netstring
+        headers = dict(zip(fields[::2], fields[1::2]))
+        body = self.rfile.read(int(headers[b"CONTENT_LENGTH"]))
+        response = self.server.dispatcher._marshaled_dispatch(body)
+        self.wfile.write(
+            b"Status: 200 OK\r\nContent-Type: text/xml\r\n"
+            b"Content-Length: %d\r\n\r\n%s" % (len(response), response)
+        )
+
+
+class _SCGITCPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class _SCGIUnixServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+class FakeRTorrent:
+    """rTorrent XML-RPC endpoint backed by an in-memory torrent list.
+
+    Served over HTTP like a web server's scgi.php, or natively over SCGI on TCP or a
+    unix socket (pass socket_path).
+    """
+
+    def __init__(
+        self,
+        torrents: list[dict],
+        latency: float = 0,
+        handshake_delay: float = 0,
+        transport: str = "http",
+        socket_path: str | None = None,
+    ):
+        self.torrents = {t["hash"]: t for t in torrents}
+        self.latency = latency  # seconds per request
+        self.lock = threading.Lock()
+        self.calls: dict[str, int] = {}
+        self.transport = transport
+        if transport == "http":
+            self.server = _XMLRPCServer(("127.0.0.1", 0), handshake_delay)
+            dispatcher = self.server
+        elif transport == "scgi":
+            if socket_path:
+                self.server = _SCGIUnixServer(socket_path, _SCGIHandler)
+            else:
+                self.server = _SCGITCPServer(("127.0.0.1", 0), _SCGIHandler)
+            dispatcher = self.server.dispatcher = _I8Dispatcher(allow_none=True)
+        else:
+            raise ValueError(f"Unknown transport: {transport}")
+        dispatcher.register_instance(self)
+        dispatcher.register_multicall_functions()
+        # the latency is paid once per request, not per call of a multicall
+        dispatcher.register_function(self._multicall, "system.multicall")
+        self.dispatcher = dispatcher
+        self.local = threading.local()
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        if self.transport == "http":
+            host, port = self.server.server_address
+            return f"http://{host}:{port}/RPC2"
+        if isinstance(self.server.server_address, str):
+            return f"scgi://{self.server.server_address}"
+        host, port = self.server.server_address
+        return f"scgi://{host}:{port}"
+
+    def start(self) -> "FakeRTorrent":
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        if isinstance(self.server.server_address, str):
+            os.unlink(self.server.server_address)
+
+    def add(self, torrent: dict):
+        with self.lock:
+            self.torrents[torrent["hash"]] = torrent
+
+    def _dispatch(self, method: str, params: tuple):
+        with self.lock:
+            self.calls[method] = self.calls.get(method, 0) + 1
+        if self.latency and not getattr(self.local, "batched", False):
+            time.sleep(self.latency)
+        if method == "d.multicall2":
+            with self.lock:
+                torrents = list(self.torrents.values())
+            fields = [MULTICALL_FIELDS[f] for f in params[2:]]
+            return [[field(t) for field in fields] for t in torrents]
+        if method in ("d.tracker_announce", "d.erase"):
+            with self.lock:
+                if params[0] not in self.torrents:
+                    raise xmlrpc.client.Fault(1, "Could not find info-hash.")
+                if method == "d.erase":
+                    del self.torrents[params[0]]
+            return 0
+        if method == "method.set_key":
+            return 0
+        raise xmlrpc.client.Fault(-506, f"Method '{method}' not defined")
+
+    def _multicall(self, calls: list[dict]) -> list:
+        with self.lock:
+            self.calls["system.multicall"] = self.calls.get("system.multicall", 0) + 1
+        if self.latency:
+            time.sleep(self.latency)
+        self.local.batched = True
+        try:
+            return self.dispatcher.system_multicall(calls)
+        finally:
+            self.local.batched = False
+
+
+def qbittorrent_torrent(torrent: dict) -> dict:
+    """Convert a synthetic torrent to the qBittorrent Web API representation."""
+    return {
+        "hash": torrent["hash"].lower(),
+        "name": torrent["name"],
+        "tags": ", ".join(torrent["labels"]),
+        "added_on": torrent["started"],
+        "completion_on": torrent["finished"] or -1,
+        "size": torrent["size"],
+        "downloaded": torrent["downloaded"],
+        "uploaded": torrent["uploaded"],
+        "dlspeed": torrent["down_rate"],
+        "upspeed": torrent["up_rate"],
+        "state": "uploading" if torrent["finished"] else "downloading",
+    }
+
+
+class _QBitTorrentHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _params(self) -> dict[str, str]:
+        url = urllib.parse.urlsplit(self.path)
+        params = dict(urllib.parse.parse_qsl(url.query))
+        length = int(self.headers.get("Content-Length", 0))
+        if length:
+            params.update(urllib.parse.parse_qsl(self.rfile.read(length).decode()))
+        return params
+
+    def _reply(self, status: int, body, headers: dict[str, str] | None = None):
+        if isinstance(body, str):
+            payload, content_type = body.encode(), "text/plain"
+        else:
+            payload, content_type = json.dumps(body).encode(), "application/json"
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _handle(self):
+        fake: FakeQBitTorrent = self.server.fake
+        path = urllib.parse.urlsplit(self.path).path.removeprefix("/api/v2/")
+        params = self._params()
+        if path == "auth/login":
+            return self._reply(200, "Ok.", {"Set-Cookie": f"SID={fake.sid}; path=/"})
+        if f"SID={fake.sid}" not in self.headers.get("Cookie", ""):
+            return self._reply(403, "Forbidden")
+        if fake.latency:
+            time.sleep(fake.latency)
+        with fake.lock:
+            fake.calls[path] = fake.calls.get(path, 0) + 1
+        status, body = fake.handle(path, params)
+        self._reply(status, body)
+
+    do_GET = _handle
+    do_POST = _handle
+
+
+class FakeQBitTorrent:
+    """qBittorrent Web API backed by an in-memory torrent list.
+
+    Implements enough of the API for the client: auth, torrents/info,
+    sync/maindata with rid deltas, torrents/trackers, reannounce and delete.
+    """
+
+    def __init__(self, torrents: list[dict], latency: float = 0):
+        self.lock = threading.Lock()
+        self.latency = latency  # seconds per request
+        self.calls: dict[str, int] = {}
+        self.sid = "fake-session"
+        self.rid = 1
+        self.torrents: dict[str, dict] = {}
+        self.changed: dict[str, dict[str, int]] = {}  # hash -> field -> rid
+        self.removed: list[tuple[int, str]] = []  # (rid, hash)
+        self.tracker_errors: dict[str, str] = {}
+        for torrent in torrents:
+            self.add(qbittorrent_torrent(torrent))
+            if torrent["message"].startswith("Tracker: ["):
+                self.tracker_errors[torrent["hash"].lower()] = torrent["message"][10:-1]
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _QBitTorrentHandler)
+        self.server.daemon_threads = True
+        self.server.fake = self
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeQBitTorrent":
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def add(self, torrent: dict):
+        with self.lock:
+            self.rid += 1
+            self.torrents[torrent["hash"]] = torrent
+            self.changed[torrent["hash"]] = {field: self.rid for field in torrent}
+
+    def update(self, infohash: str, **fields):
+        with self.lock:
+            self.rid += 1
+            self.torrents[infohash].update(fields)
+            for field in fields:
+                self.changed[infohash][field] = self.rid
+
+    def remove(self, infohash: str):
+        with self.lock:
+            self.rid += 1
+            del self.torrents[infohash]
+            del self.changed[infohash]
+            self.removed.append((self.rid, infohash))
+
+    def expire_session(self):
+        """Invalidate the session cookie so the next call has to log in again."""
+        self.sid = f"fake-session-{self.rid}"
+
+    def maindata(self, rid: int) -> dict:
+        with self.lock:
+            if rid == 0 or rid > self.rid:
+                return {
+                    "rid": self.rid,
+                    "full_update": True,
+                    "torrents": {
+                        h: {k: v for k, v in t.items() if k != "hash"}
+                        for h, t in self.torrents.items()
+                    },
+                }
+            torrents = {}
+            for infohash, fields in self.changed.items():
+                delta = {
+                    field: self.torrents[infohash][field]
+                    for field, changed in fields.items()
+                    if changed > rid and field != "hash"
+                }
+                if delta:
+                    torrents[infohash] = delta
+            removed = [h for r, h in self.removed if r > rid]
+            return {"rid": self.rid, "torrents": torrents, "torrents_removed": removed}
+
+    def handle(self, path: str, params: dict[str, str]) -> tuple[int, object]:
+        if path == "app/version":
+            return 200, "v4.6.7"
+        if path == "app/webapiVersion":
+            return 200, "2.9.3"
+        if path == "torrents/info":
+            with self.lock:
+                return 200, list(self.torrents.values())
+        if path == "sync/maindata":
+            return 200, self.maindata(int(params.get("rid", 0)))
+        if path == "torrents/trackers":
+            error = self.tracker_errors.get(params["hash"])
+            return 200, [
+                {"url": "** [DHT] **", "status": 0, "msg": ""},
+                {
+                    "url": "https://tracker/announce",
+                    "status": 4 if error else 2,
+                    "msg": error or "",
+                },
+            ]
+        hashes = params.get("hashes", "").split("|")
+        if path == "torrents/reannounce":
+            return 200, ""
+        if path == "torrents/delete":
+            for infohash in hashes:
+                if infohash in self.torrents:
+                    self.remove(infohash)
+            return 200, ""
+        return 404, "Not Found"
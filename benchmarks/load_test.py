@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""Sustained check throughput of the HTTP server, idle and while a manage job runs.
+
+Serves the real application over HTTP against a local fake rTorrent with per-call latency.
+"""
+
+import argparse
+import contextlib
+import http.client
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from typing import Callable
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from application import Application  # noqa: E402
+from benchmarks.fakes import (  # noqa: E402
+    FakeRTorrent,
+    synthetic_torrents,
+    write_config,
+)
+from benchmarks.run import latencies  # noqa: E402
+from server import Server  # noqa: E402
+
+TRACKERS = ["aither", "tl", "mam"]
+
+
+def hammer(port: int, until: threading.Event, values: list[float]):
+    """Send checks over one keep-alive connection until told to stop."""
+    connection = http.client.HTTPConnection("127.0.0.1", port)
+    i = 0
+    while not until.is_set():
+        body = json.dumps(
+            {"client": "rtorrent_1", "tracker": TRACKERS[i % 3], "size": 1 << 30}
+        )
+        start = time.perf_counter()
+        connection.request("POST", "/", body, {"Content-Type": "application/json"})
+        connection.getresponse().read()
+        values.append(time.perf_counter() - start)
+        i += 1
+    connection.close()
+
+
+def run_checks(port: int, concurrency: int, stop: Callable) -> tuple[float, list]:
+    until = threading.Event()
+    values: list[float] = []
+    threads = [
+        threading.Thread(target=hammer, args=(port, until, values))
+        for _ in range(concurrency)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    stop()
+    until.set()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, values
+
+
+def report(name: str, elapsed: float, values: list[float]):
+    result = latencies(values)
+    print(
+        f"{name:>7}: {len(values) / elapsed:.01f} checks/s over {elapsed:.01f} s, "
+        f"p50 {result['p50_ms']:.01f} ms, p99 {result['p99_ms']:.01f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--torrents", type=int, default=1000)
+    parser.add_argument("--latency-ms", type=float, default=10)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5)
+    args = parser.parse_args()
+    logging.getLogger("waitress.queue").setLevel(logging.ERROR)  # saturated on purpose
+
+    torrents = synthetic_torrents(args.torrents, TRACKERS, ["automated"])
+    fake = FakeRTorrent(torrents, latency=args.latency_ms / 1000).start()
+    try:
+        with tempfile.TemporaryDirectory() as directory, contextlib.redirect_stdout(
+            open(os.devnull, "w")
+        ):
+            app = Application(
+                write_config(
+                    directory,
+                    {"rtorrent_1": {"type": "rtorrent", "url": fake.url}},
+                    TRACKERS,
+                    {
+                        "clients": {
+                            "snapshot_ttl_seconds": 1,
+                            "remove_chunk_size": 10,
+                            "storage_cap_gb": 1 << 20,
+                        },
+                        "server": {"host": "127.0.0.1", "threads": args.threads},
+                    },
+                )
+            )
+            server = Server(app).create()
+            threading.Thread(target=server.run, daemon=True).start()
+            port = server.effective_port
+
+            idle = run_checks(port, args.concurrency, lambda: time.sleep(args.seconds))
+            connection = http.client.HTTPConnection("127.0.0.1", port)
+            connection.request("GET", "/?delete=1")
+            job = json.loads(connection.getresponse().read())
+
+            def wait_for_job():
+                while True:
+                    connection.request("GET", f"/jobs/{job['id']}")
+                    status = json.loads(connection.getresponse().read())
+                    if status["status"] in ("done", "failed"):
+                        job.update(status)
+                        return
+                    time.sleep(0.1)
+
+            managing = run_checks(port, args.concurrency, wait_for_job)
+    finally:
+        fake.stop()
+    report("idle", *idle)
+    report("manage", *managing)
+    print(
+        f"manage job {job['status']} in {job['finished_at'] - job['started_at']:.01f} s"
+    )
+
+
+if __name__ == "__main__":
+    main()
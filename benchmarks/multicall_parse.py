@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""Parse time and peak memory of a d.multicall2 response, unmarshalled versus streamed.
+
+"unmarshal" is the previous path: xmlrpc.client.loads builds the whole reply as
+nested lists, which are then converted row by row. "stream" feeds the response
+to MulticallParser in 16 KiB pieces like the transport does, appending rows to
+the snapshot as they're read and leaving out torrents without required labels.
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import sys
+import time
+import tracemalloc
+import urllib.parse
+import xmlrpc.client
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from benchmarks.fakes import (  # noqa: E402
+    MULTICALL_FIELDS,
+    _I8Marshaller,
+    synthetic_torrents,
+)
+from multicall import MulticallParser  # noqa: E402
+from rtorrent import FIELDS, RTorrentClient  # noqa: E402
+from snapshot import Snapshot  # noqa: E402
+
+CHUNK = 16 << 10
+
+
+def response(count: int, unmanaged_rate: float) -> bytes:
+    torrents = synthetic_torrents(
+        count,
+        ["aither", "tl", "mam"],
+        ["automated"],
+        error_rate=0.01,
+        unmanaged_rate=unmanaged_rate,
+    )
+    fields = [MULTICALL_FIELDS[field] for field in FIELDS]
+    rows = [[field(t) for field in fields] for t in torrents]
+    body = _I8Marshaller(allow_none=True).dumps((rows,))
+    return (
+        f"<?xml version='1.0'?>\n<methodResponse>\n{body}</methodResponse>\n".encode()
+    )
+
+
+def unmarshal(client: RTorrentClient, data: bytes) -> Snapshot:
+    """The conversion as it was before streaming."""
+    (raw_torrents,), _ = xmlrpc.client.loads(data)
+    snapshot = Snapshot()
+    for entry in raw_torrents:
+        snapshot.append(
+            infohash=entry[0],
+            name=entry[1],
+            labels=urllib.parse.unquote(entry[2]).split(",") if entry[2] else [],
+            started_at=entry[3],
+            finished_at=entry[4] if entry[4] > 0 else 0,
+            size=int(entry[5]),
+            downloaded=int(entry[6]),
+            uploaded=int(entry[7]),
+            down_rate=float(entry[8]) * 8,
+            up_rate=float(entry[9]) * 8,
+            state=client._get_status(
+                is_open=entry[11] == "1",
+                is_active=entry[12] == "1",
+                msg=entry[10],
+            ),
+            tracker_error=(
+                re.search(r"^Tracker: \[(.*)\]$", entry[10]).group(1)
+                if entry[10].startswith("Tracker: [")
+                else None
+            ),
+        )
+    return snapshot
+
+
+def stream(client: RTorrentClient, data: bytes) -> Snapshot:
+    snapshot = Snapshot()
+    parser = MulticallParser(client._appender(snapshot))
+    for i in range(0, len(data), CHUNK):
+        parser.feed(data[i : i + CHUNK])
+    parser.close()
+    return snapshot
+
+
+def measure(fn, client: RTorrentClient, data: bytes, runs: int) -> dict:
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        snapshot = fn(client, data)
+        times.append(time.perf_counter() - start)
+    # the response itself is allocated before tracing starts
+    tracemalloc.start()
+    fn(client, data)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {
+        "rows": len(snapshot),
+        "median_ms": round(statistics.median(times) * 1000, 1),
+        "peak_mib": round(peak / (1 << 20), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--torrents", type=int, default=30000)
+    parser.add_argument("--unmanaged-rate", type=float, default=0.1)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="Print JSON")
+    args = parser.parse_args()
+
+    data = response(args.torrents, args.unmanaged_rate)
+    client = RTorrentClient(
+        "bench",
+        {
+            "type": "rtorrent",
+            "url": "http://localhost/RPC2",
+            "required_labels": ["automated"],
+            "storage_cap_gb": 1,
+        },
+    )
+    results = {
+        "response_mib": round(len(data) / (1 << 20), 2),
+        "unmarshal": measure(unmarshal, client, data, args.runs),
+        "stream": measure(stream, client, data, args.runs),
+    }
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{args.torrents} torrents, {results['response_mib']} MiB response")
+    for name in ("unmarshal", "stream"):
+        result = results[name]
+        print(
+            f"{name:>9}: {result['median_ms']:>8.01f} ms, "
+            f"{result['peak_mib']:>7.02f} MiB peak, {result['rows']} rows"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""Upstream fetches and admission consistency of processes sharing a host.
+
+Worker processes each build their own Application on one config and run
+checks against one fake rTorrent, as separate server instances or concurrent
+check invocations would. This runs once per state mode ("local" keeps
+snapshots and reservations in every process, "shared" keeps them in the state
+database) and reports per mode:
+- fetches: torrent lists the fake served, next to the duration / TTL a single
+  process would need
+- accepted: admissions granted over all workers, next to the download slots
+  left on the tracker, which is all they may take while reservations are held
+- check latency percentiles over all workers
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from application import Application  # noqa: E402
+from benchmarks.fakes import write_config  # noqa: E402
+from benchmarks.run import (  # noqa: E402
+    CLIENT,
+    REQUIREMENTS,
+    Backend,
+    latencies,
+    revision,
+)
+from metrics import SNAPSHOTS  # noqa: E402
+
+LABEL = "aither"
+
+
+def mode_config(directory: str, url: str, args, slots: int, mode: str | None) -> str:
+    settings = {
+        "clients": {"snapshot_ttl_seconds": args.ttl, "reservation_ttl_seconds": 3600}
+    }
+    if mode is not None:
+        settings["state"] = {
+            "path": os.path.join(directory, f"{mode}.db"),
+            "shared": mode == "shared",
+        }
+    return write_config(
+        directory,
+        {CLIENT: {"type": "rtorrent", "url": url, "storage_cap_gb": 1 << 20}},
+        {
+            LABEL: {
+                "label": LABEL,
+                "requirements": REQUIREMENTS,
+                "download_slots": slots,
+            }
+        },
+        settings,
+        f"{mode or 'probe'}.yaml",
+    )
+
+
+def worker(config_path: str, duration: float, interval: float, barrier, results):
+    """Child process: check until the deadline, then report what it saw."""
+    app = Application(config_path)
+    sources = ("fetched", "shared")
+    # forked workers start with the parent's counts
+    before = [SNAPSHOTS.values.get((CLIENT, source), 0) for source in sources]
+    barrier.wait()
+    values, accepted = [], 0
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        ok, _ = app.check(CLIENT, LABEL, 1 << 30)
+        values.append(time.perf_counter() - start)
+        accepted += ok
+        time.sleep(interval)
+    app.logger.close()
+    results.put(
+        {
+            "values": values,
+            "accepted": accepted,
+            "snapshots": {
+                source: SNAPSHOTS.values.get((CLIENT, source), 0) - count
+                for source, count in zip(sources, before)
+            },
+        }
+    )
+
+
+def run_mode(mode: str, fake: Backend, directory: str, args, slots: int) -> dict:
+    config_path = mode_config(directory, fake.url, args, slots, mode)
+    barrier = multiprocessing.Barrier(args.workers)
+    results = multiprocessing.Queue()
+    workers = [
+        multiprocessing.Process(
+            target=worker,
+            args=(
+                config_path,
+                args.duration,
+                args.interval_ms / 1000,
+                barrier,
+                results,
+            ),
+        )
+        for _ in range(args.workers)
+    ]
+    before = fake.calls().get("d.multicall2", 0)
+    for process in workers:
+        process.start()
+    reports = [results.get() for _ in workers]
+    for process in workers:
+        process.join()
+    values = [value for report in reports for value in report["values"]]
+    return {
+        "fetches": fake.calls().get("d.multicall2", 0) - before,
+        "fetches_single_process": int(args.duration / args.ttl) + 1,
+        "snapshots": {
+            source: sum(report["snapshots"][source] for report in reports)
+            for source in ("fetched", "shared")
+        },
+        "accepted": sum(report["accepted"] for report in reports),
+        "slots_left": args.slots,
+        "checks": latencies(values),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--torrents", type=int, default=5000)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--ttl", type=float, default=1, help="Snapshot TTL (s)")
+    parser.add_argument("--duration", type=float, default=5, help="Per mode (s)")
+    parser.add_argument(
+        "--interval-ms", type=float, default=5, help="Pause between a worker's checks"
+    )
+    parser.add_argument(
+        "--slots", type=int, default=10, help="Download slots left to admit into"
+    )
+    parser.add_argument(
+        "--modes",
+        type=lambda s: s.split(","),
+        default=["local", "shared"],
+        help="Comma separated state modes",
+    )
+    parser.add_argument("--output", type=str, help="Write JSON here, not stdout")
+    args = parser.parse_args()
+
+    torrents = {
+        "count": args.torrents,
+        "labels": [LABEL, "tl"],
+        "required": ["automated"],
+    }
+    fake = Backend("rtorrent", torrents, args.latency_ms / 1000)
+    results = {}
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            # size the slots off what's downloading already, with a stateless probe
+            probe = Application(mode_config(directory, fake.url, args, 0, None))
+            index = probe.snapshot(probe.client(CLIENT))
+            slots = index.trackers[LABEL].downloading + args.slots
+            probe.logger.close()
+            for mode in args.modes:
+                print(f"{args.workers} workers, {mode} state...", file=sys.stderr)
+                results[mode] = run_mode(mode, fake, directory, args, slots)
+    finally:
+        fake.stop()
+    report = {
+        "revision": revision(),
+        "python": platform.python_version(),
+        "params": {
+            "workers": args.workers,
+            "torrents": args.torrents,
+            "latency_ms": args.latency_ms,
+            "ttl": args.ttl,
+            "duration": args.duration,
+            "interval_ms": args.interval_ms,
+            "slots": args.slots,
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""qBittorrent refresh time: full torrents/info pulls versus sync/maindata deltas.
+
+Between refreshes a fraction of the torrents on the fake backend change their rates.
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from benchmarks.fakes import FakeQBitTorrent, synthetic_torrents  # noqa: E402
+from qbittorrent import QBitTorrentClient  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--torrents", type=int, default=10000)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--churn", type=float, default=0.01)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    fake = FakeQBitTorrent(synthetic_torrents(args.torrents, ["a", "b"], [])).start()
+    config = {"url": fake.url, "storage_cap_gb": 0, "required_labels": []}
+    clients = {
+        "full": QBitTorrentClient("full", config),
+        "sync": QBitTorrentClient("sync", dict(config, sync=True)),
+    }
+    try:
+        for client in clients.values():
+            client.list_torrents()  # log in and take the initial full snapshot
+        timings = {name: [] for name in clients}
+        hashes = list(fake.torrents)
+        for _ in range(args.rounds):
+            for infohash in rng.sample(hashes, int(len(hashes) * args.churn)):
+                fake.update(infohash, upspeed=rng.randint(0, 1 << 20))
+            for name, client in clients.items():
+                start = time.perf_counter()
+                client.list_torrents()
+                timings[name].append(time.perf_counter() - start)
+    finally:
+        fake.stop()
+    for name, values in timings.items():
+        print(f"{name}: p50 {statistics.median(values) * 1000:.02f} ms")
+
+
+if __name__ == "__main__":
+    main()
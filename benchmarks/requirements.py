@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""Requirement evaluation: per-torrent string dispatch versus the compiled batch mask."""
+
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from benchmarks.snapshot_memory import build_snapshot  # noqa: E402
+from benchmarks.fakes import synthetic_torrents  # noqa: E402
+from tracker import Tracker  # noqa: E402
+
+CONFIG = {
+    "label": "tl",
+    "requirements": [
+        {"min_seed_hours": 192},
+        {"min_seed_ratio": 1, "min_seed_hours": 24},
+    ],
+    "ratio_buffer": 0.5,
+    "seed_buffer_hours": 1,
+}
+
+
+def evaluate_requirement(tracker: Tracker, torrent, name: str, value: int) -> bool:
+    """The previous per-requirement evaluator, kept as the baseline."""
+    if name == "min_seed_ratio":
+        return torrent.ratio() >= value + tracker.ratio_buffer
+    elif name == "min_seed_hours":
+        age = (datetime.now() - torrent.finished_at).total_seconds() / 3600
+        return age >= value + tracker.seed_buffer_hours
+    else:
+        raise ValueError(f"Unknown requirement: {name}")
+
+
+def dispatch(tracker: Tracker, snapshot) -> list[bool]:
+    """The previous path: string dispatch and a clock reading per requirement."""
+    return [
+        torrent.finished_at is not None
+        and any(
+            all(
+                evaluate_requirement(tracker, torrent, name, value)
+                for name, value in reqs.items()
+            )
+            for reqs in tracker.requirement_sets
+        )
+        for torrent in snapshot
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--torrents", type=int, default=100000)
+    args = parser.parse_args()
+
+    snapshot = build_snapshot(synthetic_torrents(args.torrents, ["tl"], []))
+    tracker = Tracker("tl", CONFIG)
+    start = time.perf_counter()
+    expected = dispatch(tracker, snapshot)
+    dispatch_time = time.perf_counter() - start
+    start = time.perf_counter()
+    mask = tracker.requirements.mask(snapshot, None, time.time())
+    mask_time = time.perf_counter() - start
+    assert [bool(x) for x in mask] == expected, "compiled mask disagrees"
+    print(f"dispatch: {dispatch_time * 1000:.01f} ms")
+    print(f"compiled: {mask_time * 1000:.01f} ms ({sum(mask)} satisfied)")
+
+
+if __name__ == "__main__":
+    main()
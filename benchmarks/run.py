@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""Benchmark suite over fake rTorrent and qBittorrent backends, reported as JSON.
+
+For every backend and torrent count it measures:
+- snapshot: a full torrent list fetch and index
+- check: cached and uncached check latency percentiles and throughput
+- check_batch: throughput of a batch check on a cached snapshot
+- manage: wall time of a dry run and of a deleting run
+- the calls each phase made to the fake, and the peak Python memory of the
+  snapshot and manage phases (from a separate traced pass)
+
+The fakes run in a child process so they neither compete for the GIL nor
+show up in the memory figures. Compare the output of two revisions to spot
+regressions.
+"""
+
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, ROOT)
+
+from application import Application  # noqa: E402
+from benchmarks.fakes import (  # noqa: E402
+    FakeQBitTorrent,
+    FakeRTorrent,
+    synthetic_torrents,
+    write_config,
+)
+
+CLIENT = "bench"
+REQUIREMENTS = [{"min_seed_hours": 120}, {"min_seed_ratio": 1}]
+
+
+def serve(backend: str, torrents: dict, latency: float, conn):
+    """Child process: run a fake until told to stop, answering call count queries."""
+    torrents = synthetic_torrents(**torrents)
+    if backend == "rtorrent":
+        fake = FakeRTorrent(torrents, latency).start()
+    else:
+        fake = FakeQBitTorrent(torrents, latency).start()
+    conn.send(fake.url)
+    while conn.recv() == "calls":
+        with fake.lock:
+            conn.send(dict(fake.calls))
+    fake.stop()
+
+
+class Backend:
+    """A fake backend in a child process."""
+
+    def __init__(self, backend: str, torrents: dict, latency: float):
+        self.conn, child = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(
+            target=serve, args=(backend, torrents, latency, child), daemon=True
+        )
+        self.process.start()
+        self.url = self.conn.recv()
+
+    def calls(self) -> dict[str, int]:
+        self.conn.send("calls")
+        return self.conn.recv()
+
+    def stop(self):
+        self.conn.send("stop")
+        self.process.join()
+
+
+@contextlib.contextmanager
+def counting(backend: Backend, into: dict):
+    """Record the calls the block made to the backend under into["calls"]."""
+    before = backend.calls()
+    yield
+    after = backend.calls()
+    into["calls"] = {
+        method: count - before.get(method, 0)
+        for method, count in sorted(after.items())
+        if count > before.get(method, 0)
+    }
+
+
+def bench_config(
+    directory: str, backend: str, url: str, labels: list[str], clear_errors: list[str]
+) -> str:
+    client = {"type": backend, "url": url, "storage_cap_gb": 1 << 20}
+    if backend == "qbittorrent":
+        client["sync"] = True
+    trackers = {
+        label: {
+            "label": label,
+            "requirements": REQUIREMENTS,
+            "clear_errors": ["Unregistered torrent"] if label in clear_errors else [],
+            "download_slots": 1 << 20,
+        }
+        for label in labels
+    }
+    return write_config(
+        directory,
+        {CLIENT: client},
+        trackers,
+        {"clients": {"snapshot_ttl_seconds": 3600, "reservation_ttl_seconds": 0}},
+        f"{backend}.yaml",
+    )
+
+
+def latencies(values: list[float]) -> dict:
+    """Percentiles in ms and throughput of sequential calls taking values seconds."""
+    quantiles = statistics.quantiles(values, n=100, method="inclusive")
+    return {
+        "count": len(values),
+        "p50_ms": round(quantiles[49] * 1000, 3),
+        "p90_ms": round(quantiles[89] * 1000, 3),
+        "p99_ms": round(quantiles[98] * 1000, 3),
+        "max_ms": round(max(values) * 1000, 3),
+        "per_second": round(len(values) / sum(values), 1),
+    }
+
+
+def timed_checks(app: Application, labels: list[str], count: int, cached: bool):
+    client = app.client(CLIENT)
+    values = []
+    for i in range(count):
+        if not cached:
+            app.snapshots.invalidate(CLIENT)
+        start = time.perf_counter()
+        app.check(client.name, labels[i % len(labels)], 1 << 30)
+        values.append(time.perf_counter() - start)
+    return latencies(values)
+
+
+def traced(fn) -> float:
+    """Peak traced memory of fn in MiB."""
+    tracemalloc.start()
+    try:
+        fn()
+        return round(tracemalloc.get_traced_memory()[1] / (1 << 20), 2)
+    finally:
+        tracemalloc.stop()
+
+
+def bench(backend: str, count: int, args, labels: list[str]) -> dict:
+    torrents = {
+        "count": count,
+        "labels": labels,
+        "required": ["automated"],
+        "weights": args.weights,
+        "error_rate": args.error_rate,
+        "unmanaged_rate": args.unmanaged_rate,
+    }
+    fake = Backend(backend, torrents, args.latency_ms / 1000)
+    result = {}
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            app = Application(
+                bench_config(directory, backend, fake.url, labels, args.clear_errors)
+            )
+            client = app.client(CLIENT)
+
+            # the client's first contact (e.g. a login) isn't part of any phase
+            client.list_torrents()
+            phase = result["snapshot"] = {}
+            with counting(fake, phase):
+                app.snapshots.invalidate(CLIENT)
+                start = time.perf_counter()
+                app.snapshot(client)
+                phase["wall_ms"] = round((time.perf_counter() - start) * 1000, 3)
+
+            phase = result["check_cached"] = {}
+            with counting(fake, phase):
+                phase.update(timed_checks(app, labels, args.checks, cached=True))
+            phase = result["check_uncached"] = {}
+            with counting(fake, phase):
+                phase.update(timed_checks(app, labels, args.cold_checks, cached=False))
+
+            phase = result["check_batch"] = {}
+            candidates = [
+                {"client": CLIENT, "tracker": labels[i % len(labels)], "size": 1 << 30}
+                for i in range(args.batch)
+            ]
+            with counting(fake, phase):
+                start = time.perf_counter()
+                decisions = app.check_batch(candidates)
+                elapsed = time.perf_counter() - start
+            phase["count"] = len(decisions)
+            phase["accepted"] = sum(ok for ok, _, _ in decisions)
+            phase["wall_ms"] = round(elapsed * 1000, 3)
+            phase["per_second"] = round(len(decisions) / elapsed, 1)
+
+            phase = result["manage"] = {}
+            with counting(fake, phase):
+                start = time.perf_counter()
+                app.manage()
+                phase["wall_ms"] = round((time.perf_counter() - start) * 1000, 3)
+
+            result["peak_mib"] = {
+                "snapshot": traced(
+                    lambda: (app.snapshots.invalidate(CLIENT), app.snapshot(client))
+                ),
+                "manage": traced(app.manage),
+            }
+
+            phase = result["manage_delete"] = {}
+            with counting(fake, phase):
+                start = time.perf_counter()
+                app.manage(delete=True)
+                phase["wall_ms"] = round((time.perf_counter() - start) * 1000, 3)
+            app.logger.close()
+    finally:
+        fake.stop()
+    return result
+
+
+def revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "-C", ROOT, "describe", "--always", "--dirty"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--backends",
+        type=lambda s: s.split(","),
+        default=["rtorrent", "qbittorrent"],
+        help="Comma separated backends",
+    )
+    parser.add_argument(
+        "--sizes",
+        type=lambda s: [int(size) for size in s.split(",")],
+        default=[1000, 10000],
+        help="Comma separated torrent counts, e.g. 1000,10000,100000",
+    )
+    parser.add_argument(
+        "--labels",
+        type=str,
+        default="aither:5,tl:3,mam:1,blu:1",
+        help="Tracker labels with their relative weights",
+    )
+    parser.add_argument(
+        "--clear-errors",
+        type=lambda s: s.split(","),
+        default=["blu"],
+        help="Comma separated labels whose tracker errors get torrents removed",
+    )
+    parser.add_argument("--error-rate", type=float, default=0.01)
+    parser.add_argument("--unmanaged-rate", type=float, default=0.05)
+    parser.add_argument("--latency-ms", type=float, default=1)
+    parser.add_argument("--checks", type=int, default=500)
+    parser.add_argument("--cold-checks", type=int, default=20)
+    parser.add_argument("--batch", type=int, default=2000, help="Batch check size")
+    parser.add_argument("--output", type=str, help="Write JSON here, not stdout")
+    args = parser.parse_args()
+
+    labels, args.weights = [], []
+    for spec in args.labels.split(","):
+        label, _, weight = spec.partition(":")
+        labels.append(label)
+        args.weights.append(float(weight or 1))
+
+    results = {}
+    for backend in args.backends:
+        for count in args.sizes:
+            print(f"{backend} with {count} torrents...", file=sys.stderr)
+            results.setdefault(backend, {})[str(count)] = bench(
+                backend, count, args, labels
+            )
+    report = {
+        "revision": revision(),
+        "python": platform.python_version(),
+        "params": {
+            "labels": dict(zip(labels, args.weights)),
+            "clear_errors": args.clear_errors,
+            "error_rate": args.error_rate,
+            "unmanaged_rate": args.unmanaged_rate,
+            "latency_ms": args.latency_ms,
+            "checks": args.checks,
+            "cold_checks": args.cold_checks,
+            "batch": args.batch,
+        },
+        "results": results,
+        # the benchmark process only, the fakes live in children
+        "max_rss_mib": round(
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1
+        ),
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
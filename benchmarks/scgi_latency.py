@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""RPC latency of rTorrent over HTTP (scgi.php) versus native SCGI on TCP and a unix socket.
+
+The HTTP endpoint can be given a per-request delay to model the web server and PHP hop.
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from benchmarks.fakes import FakeRTorrent, synthetic_torrents  # noqa: E402
+from rtorrent import RTorrentClient  # noqa: E402
+
+
+def measure(client: RTorrentClient, rounds: int) -> dict[str, list[float]]:
+    results = {"rpc": [], "list_torrents": []}
+    for _ in range(rounds):
+        start = time.perf_counter()
+        client._unhook_erase_event()
+        results["rpc"].append(time.perf_counter() - start)
+        start = time.perf_counter()
+        client.list_torrents()
+        results["list_torrents"].append(time.perf_counter() - start)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--torrents", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=100)
+    parser.add_argument("--php-ms", type=float, default=0)
+    args = parser.parse_args()
+
+    torrents = synthetic_torrents(args.torrents, ["aither", "tl"], ["automated"])
+    with tempfile.TemporaryDirectory() as directory:
+        fakes = {
+            "http": FakeRTorrent(torrents, latency=args.php_ms / 1000),
+            "scgi-tcp": FakeRTorrent(torrents, transport="scgi"),
+            "scgi-unix": FakeRTorrent(
+                torrents,
+                transport="scgi",
+                socket_path=os.path.join(directory, "rtorrent.sock"),
+            ),
+        }
+        for name, fake in fakes.items():
+            fake.start()
+            config = {"url": fake.url, "storage_cap_gb": 0, "required_labels": []}
+            try:
+                results = measure(RTorrentClient(name, config), args.rounds)
+            finally:
+                fake.stop()
+            print(
+                f"{name:>9}: "
+                + ", ".join(
+                    f"{call} p50 {statistics.median(values) * 1000:.03f} ms"
+                    for call, values in results.items()
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
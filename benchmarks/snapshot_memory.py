@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""Build time and memory of a columnar Snapshot versus a list of per-torrent objects."""
+
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from benchmarks.fakes import synthetic_torrents  # noqa: E402
+from snapshot import Snapshot  # noqa: E402
+
+
+class ObjectTorrent:
+    """The previous representation: one plain object per torrent."""
+
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+
+def build_objects(raw: list[dict]) -> list[ObjectTorrent]:
+    return [
+        ObjectTorrent(
+            infohash=t["hash"],
+            name=t["name"],
+            labels=list(t["labels"]),
+            started_at=datetime.fromtimestamp(t["started"]),
+            finished_at=(
+                datetime.fromtimestamp(t["finished"]) if t["finished"] > 0 else None
+            ),
+            size=t["size"],
+            downloaded=t["downloaded"],
+            uploaded=t["uploaded"],
+            down_rate=float(t["down_rate"]),
+            up_rate=float(t["up_rate"]),
+            state="OK",
+            tracker_error=None,
+        )
+        for t in raw
+    ]
+
+
+def build_snapshot(raw: list[dict]) -> Snapshot:
+    snapshot = Snapshot()
+    for t in raw:
+        snapshot.append(
+            t["hash"],
+            t["name"],
+            t["labels"],
+            t["started"],
+            t["finished"],
+            t["size"],
+            t["downloaded"],
+            t["uploaded"],
+            float(t["down_rate"]),
+            float(t["up_rate"]),
+            "OK",
+            None,
+        )
+    return snapshot
+
+
+def measure(build, raw: list[dict]) -> tuple[float, int]:
+    gc.collect()
+    start = time.perf_counter()
+    result = build(raw)
+    elapsed = time.perf_counter() - start
+    del result
+    gc.collect()
+    # traced separately as tracing slows allocation-heavy code down disproportionately
+    tracemalloc.start()
+    build(raw)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--torrents", type=int, default=100000)
+    args = parser.parse_args()
+
+    raw = synthetic_torrents(args.torrents, ["aither", "tl", "mam"], ["automated"])
+    for name, build in (("objects", build_objects), ("snapshot", build_snapshot)):
+        elapsed, peak = measure(build, raw)
+        print(f"{name:>8}: {elapsed * 1000:.01f} ms, peak {peak / (1 << 20):.01f} MiB")
+
+
+if __name__ == "__main__":
+    main()
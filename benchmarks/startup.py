@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""Startup cost of each subcommand: wall time and import time as reported by -X importtime.
+
+check and manage run for real against local fake clients, server and daemon only
+import what they'd run as they never exit.
+"""
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from benchmarks.fakes import (  # noqa: E402
+    FakeQBitTorrent,
+    FakeRTorrent,
+    synthetic_torrents,
+    write_config,
+)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+MAIN = os.path.join(ROOT, "main.py")
+IMPORT = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def measure(command: list[str]) -> dict:
+    """Run a command under -X importtime, return its wall time and heaviest imports."""
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", *command],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+    )
+    wall = time.perf_counter() - start
+    total = 0
+    top_level = []
+    for line in result.stderr.splitlines():
+        match = IMPORT.match(line)
+        if match is None:
+            continue
+        total += int(match.group(1))
+        if len(match.group(3)) == 1:  # indented by nesting depth
+            top_level.append((int(match.group(2)), match.group(4)))
+    top_level.sort(reverse=True)
+    return {
+        "wall_ms": round(wall * 1000, 1),
+        "import_ms": round(total / 1000, 1),
+        "heaviest": {name: round(us / 1000, 1) for us, name in top_level[:5]},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--json", action="store_true", help="Print JSON")
+    args = parser.parse_args()
+
+    torrents = synthetic_torrents(100, ["aither"], ["automated"])
+    rtorrent = FakeRTorrent(torrents).start()
+    qbittorrent = FakeQBitTorrent(torrents).start()
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            config = write_config(
+                directory,
+                {
+                    "rtorrent_1": {"type": "rtorrent", "url": rtorrent.url},
+                    "qbt_1": {"type": "qbittorrent", "url": qbittorrent.url},
+                },
+                ["aither"],
+                {"clients": {"storage_cap_gb": 1 << 20}},
+            )
+            check = ["--tracker", "aither", "--size", str(1 << 30)]
+            commands = {
+                "help": [MAIN],
+                "check rtorrent": [MAIN, "--config", config, "check"]
+                + ["--client", "rtorrent_1", *check],
+                "check qbittorrent": [MAIN, "--config", config, "check"]
+                + ["--client", "qbt_1", *check],
+                "manage": [MAIN, "--config", config, "manage"],
+                "server": ["-c", "import main, application, server"],
+                "daemon": ["-c", "import main, application, scheduler"],
+            }
+            results = {name: measure(command) for name, command in commands.items()}
+    finally:
+        rtorrent.stop()
+        qbittorrent.stop()
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for name, result in results.items():
+        heaviest = ", ".join(f"{k} {v}" for k, v in result["heaviest"].items())
+        print(
+            f"{name:>17}: {result['wall_ms']:>6.01f} ms wall, "
+            f"{result['import_ms']:>6.01f} ms imports ({heaviest})"
+        )
+
+
+if __name__ == "__main__":
+    main()
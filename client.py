@@ -1,6 +1,23 @@
 from abc import ABC, abstractmethod
+import contextvars
+from concurrent.futures import Executor
+import threading
+from typing import Callable
+from snapshot import Snapshot
 from torrent import Torrent
 
+# where the *_async fallbacks run blocking calls, the event loop's default executor if unset
+EXECUTOR: contextvars.ContextVar[Executor | None] = contextvars.ContextVar(
+    "executor", default=None
+)
+
+
+async def to_thread(fn: Callable, *args):
+    """Run a blocking call on EXECUTOR without blocking the event loop."""
+    import asyncio  # imported late, the check CLI has no use for an event loop
+
+    return await asyncio.get_running_loop().run_in_executor(EXECUTOR.get(), fn, *args)
+
 
 class Client(ABC):
     def __init__(self, name: str, config: dict):
@@ -14,33 +31,94 @@ class Client(ABC):
         self.up_rate_threshold = (
             self.config.get("up_rate_threshold_mbps", 0) / 8 * 1e6
         )  # bps
+        self.snapshot_ttl = self.config.get("snapshot_ttl_seconds", 0)
+        self.reservation_ttl = self.config.get("reservation_ttl_seconds", 0)
+        self.remove_chunk_size = self.config.get("remove_chunk_size", 100)
+        self.tracker_lookup_workers = self.config.get("tracker_lookup_workers", 8)
+        self.tracker_lookups = 0  # remote tracker status lookups made so far
+        self.timeout = self.config.get("timeout_seconds", 60)  # per remote call
+        self.manage_timeout = self.config.get("manage_timeout_seconds", 0)
+        # make room for a checked torrent by removing satisfied/faulted ones
+        self.evict_on_demand = self.config.get("evict_on_demand", False)
+        # average rates over the state store's window rather than one sample
+        self.smooth_rates = self.config.get("smooth_rates", False)
+        self.stale_seconds = self.config.get("stale_seconds", 0)
 
     @abstractmethod
-    def list_torrents(self) -> list[Torrent]:
+    def list_torrents(self) -> Snapshot:
         """List torrents."""
 
-    def filter(self, torrents: list[Torrent]) -> list[Torrent]:
-        """Filter torrents by required labels."""
-        return [
-            torrent
-            for torrent in torrents
-            if all(label in torrent.labels for label in self.required_labels)
-        ]
+    async def list_torrents_async(self) -> Snapshot:
+        """List torrents without blocking the event loop.
+
+        The *_async methods run their blocking counterpart on a thread unless overridden.
+        """
+        return await to_thread(self.list_torrents)
 
     @abstractmethod
     def remove_torrent(self, torrent: Torrent) -> bool:
         """Remove a torrent by its infohash."""
 
+    async def remove_torrent_async(self, torrent: Torrent) -> bool:
+        return await to_thread(self.remove_torrent, torrent)
+
+    def remove_torrents(
+        self,
+        torrents: list[Torrent],
+        on_chunk: Callable[[dict[str, bool]], None] | None = None,
+        cancelled: threading.Event | None = None,
+    ) -> dict[str, bool]:
+        """Remove torrents in chunks of remove_chunk_size. Returns success per infohash.
+
+        on_chunk is called with the results so far after every chunk. Once
+        cancelled is set, no further chunk is started.
+        """
+        results = {}
+        for i in range(0, len(torrents), self.remove_chunk_size):
+            if cancelled is not None and cancelled.is_set():
+                break
+            results.update(self._remove_chunk(torrents[i : i + self.remove_chunk_size]))
+            if on_chunk is not None:
+                on_chunk(results)
+        return results
+
+    async def remove_torrents_async(
+        self,
+        torrents: list[Torrent],
+        on_chunk: Callable[[dict[str, bool]], None] | None = None,
+        cancelled: threading.Event | None = None,
+    ) -> dict[str, bool]:
+        return await to_thread(self.remove_torrents, torrents, on_chunk, cancelled)
+
+    def _remove_chunk(self, torrents: list[Torrent]) -> dict[str, bool]:
+        """Remove a chunk of torrents. Backends override this with a batched call."""
+        return {torrent.infohash: self.remove_torrent(torrent) for torrent in torrents}
+
     @abstractmethod
     def announce(self, torrent: Torrent):
         """Announce to the tracker."""
 
+    async def announce_async(self, torrent: Torrent):
+        await to_thread(self.announce, torrent)
+
     def is_satisfied(self, torrent: Torrent) -> bool:
         """Check if the torrent satisfies the client's requirements."""
         if self.up_rate_threshold > 0:
             return torrent.up_rate < self.up_rate_threshold
         return True
 
+    def load_tracker_errors(self, torrents: list[Torrent]):
+        """Populate tracker errors of torrents that need a separate lookup."""
+
+    async def load_tracker_errors_async(self, torrents: list[Torrent]):
+        await to_thread(self.load_tracker_errors, torrents)
+
     def is_faulted(self, torrent: Torrent) -> bool:
         """Check if the torrent is faulted. Populate tracker error if lazy-loaded."""
         return torrent.tracker_error is not None
+
+    async def is_faulted_async(self, torrent: Torrent) -> bool:
+        return await to_thread(self.is_faulted, torrent)
+
+    async def aclose(self):
+        """Release connections held for the running event loop."""
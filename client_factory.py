@@ -1,20 +1,27 @@
+import importlib
+
 from client import Client
-from rtorrent import RTorrentClient
-from qbittorrent import QBitTorrentClient
+
+# client type -> "module:class", imported when a client of the type is first created
+BACKENDS = {
+    "rtorrent": "rtorrent:RTorrentClient",
+    "qbittorrent": "qbittorrent:QBitTorrentClient",
+}
 
 
 class ClientFactory:
     def __init__(self, config: dict):
         self.config = config
 
+    def backend(self, client_type: str) -> type[Client]:
+        """Resolve a client type to its class, importing its module on demand."""
+        if client_type not in BACKENDS:
+            raise ValueError(f"Unknown client type: {client_type}")
+        module, _, cls = BACKENDS[client_type].partition(":")
+        return getattr(importlib.import_module(module), cls)
+
     def create(self, name) -> Client:
         if name not in self.config:
             raise ValueError(f"Unknown client: {name}")
         client_config = self.config[name]
-        client_type = client_config["type"]
-        if client_type == "rtorrent":
-            return RTorrentClient(name, client_config)
-        elif client_type == "qbittorrent":
-            return QBitTorrentClient(name, client_config)
-        else:
-            raise ValueError(f"Unknown client type: {client_type}")
+        return self.backend(client_config["type"])(name, client_config)
@@ -12,4 +12,8 @@ class Config:
         self.clients = config["clients"]
         self.trackers = config["trackers"]
         self.log_path = config["global"]["log_path"]
+        self.logging = config["global"].get("logging", {})
         self.server = config["global"]["server"]
+        self.manage = config["global"].get("manage", {})
+        self.daemon = config["global"].get("daemon", {})
+        self.state = config["global"].get("state", {})
@@ -0,0 +1,123 @@
+import heapq
+from itertools import compress
+from operator import neg
+from typing import TYPE_CHECKING
+
+from client import Client
+from reservations import Pending
+from snapshot_index import SnapshotIndex
+from torrent import Torrent
+
+if TYPE_CHECKING:
+    from tracker import Tracker
+
+# flags of removable rows
+SATISFIED = 1
+FAULTED = 2
+
+
+def candidates(
+    index: SnapshotIndex,
+    client: Client,
+    trackers: list["Tracker"],
+    exclude: set[str],
+) -> list[tuple[int, float, int, int]]:
+    """Removable rows as (-size, up rate, finished at, row), i.e. in eviction order.
+
+    Removable means satisfied or faulted, the same as manage would delete.
+    Only tracker errors already known are considered, check must not wait on lookups.
+    """
+    snapshot = index.torrents
+    size, up_rate, finished_at = snapshot.size, snapshot.up_rate, snapshot.finished_at
+    errors, errors_loaded = snapshot.tracker_error, snapshot.tracker_error_loaded
+    removable = bytearray(len(snapshot))
+    for tracker in trackers:
+        if not tracker.enabled:
+            continue
+        stats = index.trackers[tracker.name]
+        for row in compress(stats.rows, stats.satisfied):
+            removable[row] |= SATISFIED
+        if tracker.clear_errors:
+            for row in stats.rows:
+                if errors_loaded[row] and errors[row] in tracker.clear_errors:
+                    removable[row] |= FAULTED
+    rows = list(compress(range(len(snapshot)), removable))
+    # Client.is_satisfied on the column, as views would be slow for every row
+    threshold = client.up_rate_threshold
+    if threshold > 0:
+        rows = [
+            row for row in rows if removable[row] & FAULTED or up_rate[row] < threshold
+        ]
+    if exclude:
+        rows = [row for row in rows if snapshot.infohash[row] not in exclude]
+    return list(
+        zip(
+            map(neg, map(size.__getitem__, rows)),
+            map(up_rate.__getitem__, rows),
+            map(finished_at.__getitem__, rows),
+            rows,
+        )
+    )
+
+
+def plan(
+    index: SnapshotIndex,
+    client: Client,
+    tracker: "Tracker",
+    trackers: list["Tracker"],
+    size: int,
+    pending: Pending,
+    exclude: set[str] = frozenset(),
+) -> list[Torrent] | None:
+    """Find the fewest removable torrents that make room for size bytes on tracker.
+
+    Larger torrents go first, then slower uploading, then longer finished ones.
+    Returns an empty list if there is room already, None if no eviction makes enough.
+    """
+    client_need = index.client.size + pending.client_size + size - client.storage_cap
+    tracker_need = 0
+    if tracker.storage_cap > 0:
+        tracker_need = (
+            index.trackers[tracker.name].size
+            + pending.size
+            + size
+            - tracker.storage_cap
+        )
+    if client_need <= 0 and tracker_need <= 0:
+        return []
+    entries = candidates(index, client, trackers, exclude)
+    tracker_rows = set(index.trackers[tracker.name].rows) if tracker_need > 0 else ()
+    # the largest torrents of the tracker cover its need in the fewest removals,
+    # whatever the client still needs is then covered by the largest of the rest
+    own = [entry for entry in entries if entry[3] in tracker_rows]
+    heapq.heapify(own)
+    chosen = []
+    while tracker_need > 0:
+        if not own:
+            return None
+        entry = heapq.heappop(own)
+        chosen.append(entry)
+        tracker_need += entry[0]
+        client_need += entry[0]
+    if client_need > 0:
+        taken = {entry[3] for entry in chosen}
+        rest = [entry for entry in entries if entry[3] not in taken]
+        heapq.heapify(rest)
+        while client_need > 0:
+            if not rest:
+                return None
+            entry = heapq.heappop(rest)
+            chosen.append(entry)
+            client_need += entry[0]
+    return [Torrent.view(index.torrents, entry[3]) for entry in chosen]
+
+
+def credit(pending: Pending, torrents: list[Torrent], tracker: "Tracker") -> Pending:
+    """Pending capacity with the space of torrents being evicted given back."""
+    freed = sum(torrent.size for torrent in torrents)
+    freed_tracker = sum(
+        torrent.size for torrent in torrents if tracker.label in torrent.labels
+    )
+    return Pending(
+        pending.client_size - freed, pending.size - freed_tracker, pending.count
+    )
@@ -0,0 +1,83 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+
+class Job:
+    """A background job and its status."""
+
+    def __init__(self, kind: str, params: dict):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.params = params
+        self.status = "queued"  # queued -> running -> done | failed
+        self.error: str | None = None
+        self.created_at = time.time()
+        self.started_at: float | None = None
+        self.finished_at: float | None = None
+        self.finished = threading.Event()
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "params": self.params,
+            "status": self.status,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobManager:
+    """Runs jobs on a small worker pool and keeps the most recent ones for lookup.
+
+    A job is coalesced into an identical one that's still queued.
+    """
+
+    def __init__(self, workers: int = 1, history: int = 100):
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="job"
+        )
+        self.history = history
+        self.jobs: OrderedDict[str, Job] = OrderedDict()
+        self.lock = threading.Lock()
+
+    def submit(self, kind: str, fn: Callable[..., None], **params) -> Job:
+        """Queue fn(**params), or return the queued job already doing the same."""
+        with self.lock:
+            for job in self.jobs.values():
+                if job.status == "queued" and job.kind == kind and job.params == params:
+                    return job
+            job = Job(kind, params)
+            self.jobs[job.id] = job
+            while len(self.jobs) > self.history:
+                oldest = next(iter(self.jobs.values()))
+                if not oldest.finished.is_set():
+                    break
+                self.jobs.popitem(last=False)
+        self.executor.submit(self._run, job, fn)
+        return job
+
+    def get(self, job_id: str) -> Job | None:
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def _run(self, job: Job, fn: Callable[..., None]):
+        with self.lock:
+            job.status = "running"
+            job.started_at = time.time()
+        try:
+            fn(**job.params)
+            status, error = "done", None
+        except Exception as e:
+            status, error = "failed", str(e)
+        with self.lock:
+            job.status = status
+            job.error = error
+            job.finished_at = time.time()
+        job.finished.set()
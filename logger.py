@@ -1,13 +1,154 @@
 import atexit
+import json
+import os
+import queue
+import sys
+import threading
+import time
 from datetime import datetime
 
+# (epoch time, message, structured fields)
+Entry = tuple[float, str, dict]
+
 
 class Logger:
-    def __init__(self, log_path: str):
+    """Logs to a file and stdout from a background thread.
+
+    Callers only enqueue. The writer drains whatever has queued up, writes it
+    with one flush and echoes it with one stdout write, so logging never waits
+    on the disk or terminal. Lines are text (timestamp: message) or, with
+    format json, JSON objects carrying the message and its fields.
+    Once the file reaches max_bytes it's rotated to log_path.1 and so on,
+    keeping backups old files. 0 disables rotation.
+    """
+
+    def __init__(
+        self,
+        log_path: str,
+        format: str = "text",
+        echo: bool = True,
+        max_bytes: int = 0,
+        backups: int = 3,
+    ):
+        if format not in ("text", "json"):
+            raise ValueError(f"Unknown log format: {format}")
+        self.path = log_path
+        self.format = format
+        self.echo = echo
+        self.max_bytes = max_bytes
+        self.backups = backups
         self.file = open(log_path, "a", encoding="utf-8")
-        atexit.register(self.file.close)
+        self.queue: queue.SimpleQueue[list[Entry] | threading.Event | None] = (
+            queue.SimpleQueue()
+        )
+        self.writer = threading.Thread(target=self._run, name="logger", daemon=True)
+        self.writer.start()
+        atexit.register(self.close)
+
+    def log(self, message: str, **fields):
+        self.queue.put([(time.time(), message, fields)])
+
+    def write(self, entries: list[Entry]):
+        """Write timestamped messages as one uninterrupted block."""
+        if entries:
+            self.queue.put(entries)
+
+    def buffer(self) -> "BufferedLogger":
+        """Get a logger that holds messages back until flushed."""
+        return BufferedLogger(self)
+
+    def flush(self, timeout: float | None = None):
+        """Wait until everything logged so far is written."""
+        if self.writer.is_alive():
+            done = threading.Event()
+            self.queue.put(done)
+            done.wait(timeout)
+
+    def close(self):
+        """Write what's queued and stop the writer."""
+        if self.writer.is_alive():
+            self.queue.put(None)
+            self.writer.join()
+        self.file.close()
 
-    def log(self, message: str):
-        self.file.write(f"{datetime.now()}: {message}\n")
+    def _run(self):
+        stopped = False
+        while not stopped:
+            items = [self.queue.get()]
+            # batch everything that queued up meanwhile
+            while True:
+                try:
+                    items.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            entries, waiters = [], []
+            for item in items:
+                if item is None:
+                    stopped = True
+                elif isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    entries.extend(item)
+            try:
+                self._write(entries)
+            except Exception as e:  # the writer must outlive a full disk
+                print(f"Logging failed: {e}", file=sys.stderr)
+            for done in waiters:
+                done.set()
+
+    def _write(self, entries: list[Entry]):
+        if not entries:
+            return
+        if self.format == "json":
+            lines = "".join(
+                json.dumps(
+                    {
+                        "time": datetime.fromtimestamp(at).isoformat(),
+                        "message": message,
+                        **fields,
+                    },
+                    ensure_ascii=False,
+                )
+                + "\n"
+                for at, message, fields in entries
+            )
+        else:
+            lines = "".join(
+                f"{datetime.fromtimestamp(at)}: {message}\n"
+                for at, message, _ in entries
+            )
+        position = self.file.tell()
+        if self.max_bytes and position and position + len(lines) > self.max_bytes:
+            self._rotate()
+        self.file.write(lines)
         self.file.flush()
-        print(message)
+        if self.echo:
+            sys.stdout.write("".join(f"{message}\n" for _, message, _ in entries))
+            sys.stdout.flush()
+
+    def _rotate(self):
+        """Shift log_path.N to log_path.N+1, dropping the oldest, and start afresh."""
+        self.file.close()
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"):
+                os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        if self.backups:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self.file = open(self.path, "a", encoding="utf-8")
+
+
+class BufferedLogger:
+    """Collects messages and hands them to its parent logger as one block."""
+
+    def __init__(self, parent: Logger):
+        self.parent = parent
+        self.entries: list[Entry] = []
+
+    def log(self, message: str, **fields):
+        self.entries.append((time.time(), message, fields))
+
+    def flush(self):
+        entries, self.entries = self.entries, []
+        self.parent.write(entries)
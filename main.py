@@ -3,9 +3,46 @@
 import sys
 import os
 import argparse
+import contextlib
+import json
+from typing import TYPE_CHECKING
 
-from application import Application
-from server import Server
+if TYPE_CHECKING:
+    from application import Application
+
+
+def check_batch(app: "Application", path: str) -> bool:
+    """Print a decision per candidate of a JSON lines file. Returns whether all were accepted.
+
+    Lines that aren't valid JSON are rejected as invalid, like in POST /batch.
+    """
+    with (
+        contextlib.nullcontext(sys.stdin)
+        if path == "-"
+        else open(path, encoding="utf-8")
+    ) as f:
+        lines = [line for line in f if line.strip()]
+    candidates, errors = [], {}
+    for i, line in enumerate(lines):
+        try:
+            candidates.append(json.loads(line))
+        except json.JSONDecodeError as e:
+            errors[i] = f"Invalid JSON: {e}."
+    app.logger.echo = False  # keep stdout to the decisions
+    results = iter(app.check_batch(candidates))
+    candidates = iter(candidates)
+    ok = True
+    for i in range(len(lines)):
+        if i in errors:
+            candidate, (accepted, reason, msg) = None, (False, "invalid", errors[i])
+        else:
+            candidate, (accepted, reason, msg) = next(candidates), next(results)
+        decision = {"ok": accepted, "reason": reason, "message": msg}
+        if isinstance(candidate, dict):
+            decision = {**candidate, **decision}
+        print(json.dumps(decision))
+        ok = ok and accepted
+    return ok
 
 
 def main():
@@ -17,6 +54,11 @@ def main():
         default=f"{script_dir}/config.yaml",
         help="Path to the configuration file",
     )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Print per-phase timings and call counts to stderr when done",
+    )
     subparsers = parser.add_subparsers(dest="command", description="available commands")
     check_parser = subparsers.add_parser(
         "check", help="Check if a torrent can be added"
@@ -32,29 +74,70 @@ def main():
         type=int,
         help="Size in bytes",
     )
+    check_parser.add_argument(
+        "--batch",
+        type=str,
+        metavar="FILE",
+        help="Check the JSON lines {client, tracker, size} of FILE (- for stdin) in order, "
+        "each taking up capacity for the ones after it. Prints a JSON line per decision",
+    )
     manage_parser = subparsers.add_parser("manage", help="Manage torrents")
     manage_parser.add_argument(
         "--delete",
         action="store_true",
         help="Delete satisfied torrents",
     )
+    daemon_parser = subparsers.add_parser(
+        "daemon", help="Manage torrents whenever they're forecast to be satisfied"
+    )
+    daemon_parser.add_argument(
+        "--delete",
+        action="store_true",
+        help="Delete satisfied torrents",
+    )
     subparsers.add_parser("server", help="Run as HTTP server")
 
     args = parser.parse_args()
+    if (
+        args.command == "check"
+        and args.batch
+        and (args.client or args.tracker or args.size is not None)
+    ):
+        check_parser.error(
+            "--batch can't be combined with --client, --tracker or --size"
+        )
 
-    app = Application(args.config)
-    if args.command == "check":
-        ok, _ = app.check(args.client, args.tracker, args.size)
-        if not ok:
-            sys.exit(1)
-        return
-    elif args.command == "manage":
-        app.manage(delete=args.delete)
-    elif args.command == "server":
-        Server(app).run()
-    else:
+    if args.command is None:
         print("Meow! What can I do for you?")
         parser.print_help()
+        return
+    # imported here so that every subcommand only loads what it needs
+    from application import Application
+
+    app = Application(args.config)
+    ok = True
+    try:
+        if args.command == "check" and args.batch:
+            ok = check_batch(app, args.batch)
+        elif args.command == "check":
+            ok, _ = app.check(args.client, args.tracker, args.size)
+        elif args.command == "manage":
+            app.manage(delete=args.delete)
+        elif args.command == "daemon":
+            from scheduler import Scheduler
+
+            Scheduler(app, delete=args.delete).run()
+        elif args.command == "server":
+            from server import Server
+
+            Server(app).run()
+    finally:
+        if args.profile:
+            from metrics import REGISTRY
+
+            print(REGISTRY.summary(), file=sys.stderr)
+    if not ok:
+        sys.exit(1)
 
 
 if __name__ == "__main__":
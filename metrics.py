@@ -0,0 +1,177 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+# seconds, from a cached check up to a slow manage phase
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if value == int(value) else repr(value)
+
+
+class Counter:
+    """A monotonically increasing value per label set."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.lock = threading.Lock()
+        self.values: dict[tuple[str, ...], float] = {}
+        REGISTRY.register(self)
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = tuple(str(labels[name]) for name in self.labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self) -> Iterator[str]:
+        with self.lock:
+            values = sorted(self.values.items())
+        for key, value in values:
+            yield f"{self.name}{_labels(self.labels, key)} {_number(value)}"
+
+    def summary(self) -> Iterator[str]:
+        with self.lock:
+            values = sorted(self.values.items())
+        for key, value in values:
+            yield f"{self.name}{_labels(self.labels, key)}: {_number(value)}"
+
+
+class Histogram:
+    """Observations bucketed per label set, with their count and sum."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = BUCKETS,
+    ):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        # label values -> (count per bucket, count, sum)
+        self.values: dict[tuple[str, ...], tuple[list[int], int, float]] = {}
+        REGISTRY.register(self)
+
+    def observe(self, value: float, **labels: str):
+        key = tuple(str(labels[name]) for name in self.labels)
+        with self.lock:
+            buckets, count, total = self.values.get(
+                key, ([0] * len(self.buckets), 0, 0.0)
+            )
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    buckets[i] += 1
+            self.values[key] = (buckets, count + 1, total + value)
+
+    @contextmanager
+    def time(self, **labels: str):
+        """Observe the duration of the block in seconds."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self) -> Iterator[str]:
+        with self.lock:
+            values = sorted(
+                (k, (list(b), c, s)) for k, (b, c, s) in self.values.items()
+            )
+        for key, (buckets, count, total) in values:
+            for bound, observed in zip(self.buckets, buckets):
+                le = _labels(self.labels, key, f'le="{bound:g}"')
+                yield f"{self.name}_bucket{le} {observed}"
+            le = _labels(self.labels, key, 'le="+Inf"')
+            yield f"{self.name}_bucket{le} {count}"
+            yield f"{self.name}_count{_labels(self.labels, key)} {count}"
+            yield f"{self.name}_sum{_labels(self.labels, key)} {_number(total)}"
+
+    def summary(self) -> Iterator[str]:
+        with self.lock:
+            values = sorted((k, c, s) for k, (_, c, s) in self.values.items())
+        for key, count, total in values:
+            yield (
+                f"{self.name}{_labels(self.labels, key)}: {count} x "
+                f"{total / count * 1000:.02f} ms = {total * 1000:.02f} ms"
+            )
+
+
+class Registry:
+    """All metrics of the process."""
+
+    def __init__(self):
+        self.metrics: list[Counter | Histogram] = []
+
+    def register(self, metric: Counter | Histogram):
+        self.metrics.append(metric)
+
+    def render(self) -> str:
+        """Prometheus text exposition format."""
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> str:
+        """Human readable totals of whatever was recorded, for --profile."""
+        return "\n".join(line for metric in self.metrics for line in metric.summary())
+
+
+REGISTRY = Registry()
+
+CHECK_SECONDS = Histogram(
+    "torrent_manager_check_seconds", "Latency of admission checks.", ("phase",)
+)
+FETCH_SECONDS = Histogram(
+    "torrent_manager_fetch_seconds",
+    "Latency of listing a client's torrents.",
+    ("backend",),
+)
+MANAGE_PHASE_SECONDS = Histogram(
+    "torrent_manager_manage_phase_seconds",
+    "Duration of manage phases per client.",
+    ("phase",),
+)
+RPCS = Counter(
+    "torrent_manager_rpcs_total", "Remote calls issued.", ("backend", "method")
+)
+SNAPSHOTS = Counter(
+    "torrent_manager_snapshots_total",
+    "Client snapshots listed upstream or loaded from shared state.",
+    ("client", "source"),
+)
+TORRENTS_EVALUATED = Counter(
+    "torrent_manager_torrents_evaluated_total",
+    "Torrents evaluated against tracker requirements.",
+    ("client",),
+)
+ADMISSIONS = Counter(
+    "torrent_manager_admissions_total",
+    "Admission check outcomes.",
+    ("result", "reason"),
+)
+FREED_BYTES = Counter(
+    "torrent_manager_freed_bytes_total",
+    "Bytes freed by removing torrents.",
+    ("client", "cause"),
+)
@@ -0,0 +1,115 @@
+import html
+import re
+import xmlrpc.client
+from typing import Callable
+
+# A scalar <value>, an array boundary, other markup of a method response,
+# or the first character of anything else
+TOKEN = re.compile(
+    rb"<value>\s*(?:<(string|i4|i8|int|double|boolean)>([^<]*)</\1>|<string/>()|([^<]*))\s*</value>"
+    rb"|<(/?)array>"
+    rb"|</?(?:data|value|param|params|methodResponse)>|<\?xml[^>]*>"
+    rb"|(\S)"
+)
+INTEGERS = (b"i4", b"i8", b"int")
+
+
+def _string(text: bytes) -> str:
+    string = text.decode()
+    return html.unescape(string) if "&" in string else string
+
+
+class MulticallParser:
+    """Streams a d.multicall2 response, handing each row to on_row as it's read.
+
+    The reply is an array of rows, each an array of scalars. Rows are passed on
+    as lists of str/int/float/bool in field order and never collected, so only
+    the row being read is in memory next to the undecoded input.
+    The reply is tokenized with a regular expression rather than a generic XML
+    parser, which would call back into Python for every element and character run.
+    A reply of another shape, such as a fault, is unmarshalled by xmlrpc.client
+    instead, as long as it deviates before the first row.
+    Fits Transport.getparser() as both the parser and the unmarshaller.
+    """
+
+    def __init__(self, on_row: Callable[[list], None]):
+        self.on_row = on_row
+        self.rows = 0
+        self.depth = 0  # array nesting, rows are at 2
+        self.row: list = []
+        self.pending = b""  # input after the last complete token
+        self.head: list[bytes] | None = []  # input up to the first row
+        self.fallback = False
+        self.result: tuple | None = None
+
+    def feed(self, data: bytes):
+        if self.head is not None:
+            self.head.append(data)
+            if self.fallback:
+                return
+        data = self.pending + data
+        # every scalar ends in </value>, so the input up to the last one ends on a token
+        end = data.rfind(b"</value>")
+        if end < 0:
+            self.pending = data
+            return
+        end += len(b"</value>")
+        self.pending = data[end:]
+        self._scan(data, end)
+
+    def close(self) -> tuple:
+        """Finish parsing. Returns the number of rows read as a 1-tuple, like loads().
+
+        A fault response raises xmlrpc.client.Fault.
+        """
+        if self.result is None:
+            if not self.fallback:
+                self._scan(self.pending, len(self.pending))
+                self.pending = b""
+            if self.fallback:
+                (rows,), _ = xmlrpc.client.loads(b"".join(self.head))
+                for row in rows:
+                    self.rows += 1
+                    self.on_row(row)
+            elif self.depth != 0:
+                raise ValueError("Truncated d.multicall2 response")
+            self.result = (self.rows,)
+        return self.result
+
+    def _scan(self, data: bytes, end: int):
+        depth, row = self.depth, self.row
+        for match in TOKEN.finditer(data, 0, end):
+            kind, text, empty, bare, array, other = match.groups()
+            if kind is not None:
+                if depth != 2:
+                    continue
+                if kind in INTEGERS:
+                    row.append(int(text))
+                elif kind == b"string":
+                    row.append(_string(text))
+                elif kind == b"double":
+                    row.append(float(text))
+                else:
+                    row.append(text == b"1")
+            elif array is not None:
+                if array:
+                    if depth == 2:
+                        self.rows += 1
+                        self.on_row(row)
+                    depth -= 1
+                else:
+                    depth += 1
+                    if depth == 2:
+                        row = []
+                        self.head = None  # too late to fall back
+            elif bare is not None or empty is not None:
+                if depth == 2:
+                    row.append(_string(bare or b""))  # an untyped <value> is a string
+            elif other is not None:
+                if self.head is None:
+                    raise ValueError(
+                        f"Unexpected {data[match.start() : match.start() + 40]!r} in a d.multicall2 response"
+                    )
+                self.fallback = True
+                break
+        self.depth, self.row = depth, row
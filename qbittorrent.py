@@ -1,6 +1,9 @@
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+import threading
 import qbittorrentapi
 from client import Client
+from metrics import RPCS
+from snapshot import Snapshot
 from torrent import Torrent
 
 
@@ -10,35 +13,78 @@ class QBitTorrentClient(Client):
         auth = config.get("auth", None)
         username = None if auth is None else auth.get("username")
         password = None if auth is None else auth.get("password")
+        pool_size = config.get("connection_pool_size", 10)
+        # the session is logged in lazily and re-authenticated by the library on a 403
         self.client = qbittorrentapi.Client(
-            host=config["url"], username=username, password=password
+            host=config["url"],
+            username=username,
+            password=password,
+            HTTPADAPTER_ARGS={"pool_connections": pool_size, "pool_maxsize": pool_size},
+            REQUESTS_ARGS={
+                "timeout": self.timeout,
+                "hooks": {"response": self._count_request},
+            },
         )
+        self.lookups_lock = threading.Lock()
+        self.sync = config.get("sync", False)
+        self.sync_lock = threading.Lock()
+        self.rid = 0  # sync/maindata response id of the state below
+        self.raw: dict[str, dict] = {}  # infohash -> Web API fields
+        self.rows: dict[str, tuple] = {}  # infohash -> Snapshot.append arguments
 
-    def list_torrents(self) -> list[Torrent]:
+    @staticmethod
+    def _count_request(response, *args, **kwargs):
+        path = response.request.path_url.partition("?")[0]
+        RPCS.inc(backend="qbittorrent", method=path.partition("/api/v2/")[2] or path)
+
+    def _to_row(self, infohash: str, t: dict) -> tuple:
+        """Convert a torrent's Web API representation into Snapshot.append arguments."""
+        return (
+            infohash,
+            t["name"],
+            [tag.strip() for tag in t["tags"].split(",")] if t["tags"] else [],
+            t["added_on"],
+            t["completion_on"] if t["completion_on"] > 0 else 0,
+            t["size"],
+            t["downloaded"],
+            t["uploaded"],
+            t["dlspeed"],
+            t["upspeed"],
+            t["state"],
+            None,
+        )
+
+    def list_torrents(self) -> Snapshot:
         """List torrents."""
-        raw = self.client.torrents_info()
-        torrents = [
-            Torrent(
-                infohash=t.hash,
-                name=t.name,
-                labels=[tag.strip() for tag in t.tags.split(",")] if t.tags else [],
-                started_at=datetime.fromtimestamp(t.added_on),
-                finished_at=(
-                    datetime.fromtimestamp(t.completion_on)
-                    if t.completion_on > 0
-                    else None
-                ),
-                size=t.size,
-                downloaded=t.downloaded,
-                uploaded=t.uploaded,
-                down_rate=t.dlspeed,
-                up_rate=t.upspeed,
-                state=t.state,
-                tracker_error=None,
-            )
-            for t in raw
-        ]
-        return torrents
+        if self.sync:
+            return self._sync_torrents()
+        snapshot = Snapshot()
+        for t in self.client.torrents_info():
+            snapshot.append(*self._to_row(t["hash"], t))
+        return snapshot
+
+    def _sync_torrents(self) -> Snapshot:
+        """List torrents by applying sync/maindata deltas to the last known state.
+
+        Only torrents that changed since the previous refresh are converted again.
+        """
+        with self.sync_lock:
+            data = self.client.sync_maindata(rid=self.rid)
+            if data.get("full_update"):
+                self.raw.clear()
+                self.rows.clear()
+            for infohash in data.get("torrents_removed", []):
+                self.raw.pop(infohash, None)
+                self.rows.pop(infohash, None)
+            for infohash, delta in data.get("torrents", {}).items():
+                raw = self.raw.setdefault(infohash, {})
+                raw.update(delta)
+                self.rows[infohash] = self._to_row(infohash, raw)
+            self.rid = data["rid"]
+            snapshot = Snapshot()
+            for row in self.rows.values():
+                snapshot.append(*row)
+            return snapshot
 
     def announce(self, torrent: Torrent):
         """Announce to the tracker."""
@@ -50,15 +96,43 @@ class QBitTorrentClient(Client):
         self.client.torrents_delete(True, torrent.infohash)
         return True
 
-    def is_faulted(self, torrent):
-        """Check if the torrent is faulted. Populate tracker error if lazy-loaded."""
-        if torrent.state == "error" or torrent.tracker_error is not None:
-            return True
-        # Lazy load tracker error
+    def _remove_chunk(self, torrents: list[Torrent]) -> dict[str, bool]:
+        """Reannounce and delete a chunk of torrents with one call each."""
+        hashes = [torrent.infohash for torrent in torrents]
+        # the library sends lists as the pipe-separated hash lists the API expects
+        self.client.torrents_reannounce(torrent_hashes=hashes)
+        self.client.torrents_delete(delete_files=True, torrent_hashes=hashes)
+        return {infohash: True for infohash in hashes}
+
+    def _load_tracker_error(self, torrent: Torrent):
+        """Look up the torrent's tracker status and memoize its error."""
         trackers = self.client.torrents_trackers(torrent.infohash)
+        with self.lookups_lock:
+            self.tracker_lookups += 1
         for tracker in trackers:
             # Tracker has been contacted, but it is not working (or doesn't send proper replies)
             if tracker["status"] == 4 and tracker["msg"] != "":
                 torrent.tracker_error = tracker["msg"]
-                return True
-        return False
+                break
+        torrent.tracker_error_loaded = True
+
+    def load_tracker_errors(self, torrents: list[Torrent]):
+        """Populate tracker errors of torrents that need a separate lookup."""
+        pending = [
+            torrent
+            for torrent in torrents
+            if torrent.state != "error" and not torrent.tracker_error_loaded
+        ]
+        if not pending:
+            return
+        with ThreadPoolExecutor(self.tracker_lookup_workers) as executor:
+            # list() re-raises the first lookup failure
+            list(executor.map(self._load_tracker_error, pending))
+
+    def is_faulted(self, torrent):
+        """Check if the torrent is faulted. Populate tracker error if lazy-loaded."""
+        if torrent.state == "error" or torrent.tracker_error is not None:
+            return True
+        if not torrent.tracker_error_loaded:
+            self._load_tracker_error(torrent)
+        return torrent.tracker_error is not None
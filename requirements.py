@@ -0,0 +1,95 @@
+from typing import Iterable
+
+from snapshot import Snapshot
+from torrent import Torrent
+
+REQUIREMENTS = ("min_seed_ratio", "min_seed_hours")
+
+
+class CompiledRequirements:
+    """Tracker requirement sets compiled into numeric thresholds.
+
+    Each set becomes a (min ratio, min seconds since finishing) pair, buffers included.
+    A torrent is satisfied when it's finished and meets both thresholds of any set.
+    """
+
+    def __init__(
+        self,
+        requirement_sets: list[dict],
+        ratio_buffer: float,
+        seed_buffer_hours: float,
+    ):
+        if not isinstance(requirement_sets, list):
+            raise ValueError("Requirements must be a list of requirement sets.")
+        self.sets: list[tuple[float, float]] = []
+        for reqs in requirement_sets:
+            if not isinstance(reqs, dict):
+                raise ValueError(f"Requirement set must be a mapping: {reqs}")
+            min_ratio = min_seconds = float("-inf")
+            for name, value in reqs.items():
+                if name not in REQUIREMENTS:
+                    raise ValueError(f"Unknown requirement: {name}")
+                if not isinstance(value, (int, float)):
+                    raise ValueError(f"Requirement {name} must be a number: {value}")
+                if name == "min_seed_ratio":
+                    min_ratio = value + ratio_buffer
+                else:
+                    min_seconds = (value + seed_buffer_hours) * 3600
+            self.sets.append((min_ratio, min_seconds))
+
+    def is_satisfied(self, torrent: Torrent, now: float) -> bool:
+        """Evaluate a single torrent at epoch time now."""
+        return bool(self.mask(torrent.snapshot, (torrent.row,), now)[0])
+
+    def mask(
+        self, snapshot: Snapshot, rows: Iterable[int] | None, now: float
+    ) -> bytearray:
+        """Evaluate rows of a snapshot (all if None) at epoch time now in one pass.
+
+        Returns a satisfied mask aligned with rows.
+        """
+        if rows is None:
+            rows = range(len(snapshot))
+        finished_at = snapshot.finished_at
+        uploaded = snapshot.uploaded
+        downloaded = snapshot.downloaded
+        sets = self.sets
+        satisfied = bytearray()
+        for row in rows:
+            finished = finished_at[row]
+            if finished == 0 or not sets:
+                satisfied.append(0)
+                continue
+            age = now - finished
+            down = downloaded[row]
+            ratio = uploaded[row] / down if down else 0.0
+            for min_ratio, min_seconds in sets:
+                if ratio >= min_ratio and age >= min_seconds:
+                    satisfied.append(1)
+                    break
+            else:
+                satisfied.append(0)
+        return satisfied
+
+    def satisfied_at(
+        self, snapshot: Snapshot, row: int, now: float, upload_rate: float | None
+    ) -> float:
+        """Forecast the epoch time a row becomes satisfied, inf if it can't be told.
+
+        Seed time follows from the finish time, ratio from upload_rate (bytes per second).
+        """
+        finished = snapshot.finished_at[row]
+        if finished == 0:
+            return float("inf")
+        uploaded = snapshot.uploaded[row]
+        downloaded = snapshot.downloaded[row]
+        ratio = uploaded / downloaded if downloaded else 0.0
+        earliest = float("inf")
+        for min_ratio, min_seconds in self.sets:
+            at = max(now, finished + min_seconds)
+            if ratio < min_ratio:
+                if not upload_rate or not downloaded:
+                    continue
+                at = max(at, now + (min_ratio * downloaded - uploaded) / upload_rate)
+            earliest = min(earliest, at)
+        return earliest
@@ -0,0 +1,184 @@
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+
+from snapshot import Snapshot
+
+
+class Reservation:
+    """Capacity held for an approved torrent until it shows up in the client."""
+
+    def __init__(
+        self,
+        id: int,
+        client: str,
+        tracker: str,
+        label: str,
+        size: int,
+        ttl: float,
+        created_at: float | None = None,  # epoch seconds, now by default
+    ):
+        self.id = id
+        self.client = client
+        self.tracker = tracker
+        self.label = label
+        self.size = size  # bytes
+        self.created_at = time.time() if created_at is None else created_at
+        self.expires_at = time.monotonic() + ttl
+        # epoch time of the first snapshot listing the torrent, None until then
+        self.settled_at: float | None = None
+
+
+class Pending:
+    """Reserved capacity not yet reflected in a client snapshot."""
+
+    def __init__(self, client_size: int = 0, size: int = 0, count: int = 0):
+        self.client_size = client_size  # bytes reserved on the client
+        self.size = size  # bytes reserved on the tracker
+        self.count = count  # torrents reserved on the tracker
+
+    def __add__(self, other: "Pending") -> "Pending":
+        return Pending(
+            self.client_size + other.client_size,
+            self.size + other.size,
+            self.count + other.count,
+        )
+
+
+def settled(
+    reservations: list[Reservation], snapshot: Snapshot, skew: float
+) -> list[Reservation]:
+    """Reservations matched by a torrent of the same size and label, one torrent each.
+
+    Torrents started over skew seconds before a reservation was made don't match it.
+    Reservations settled already keep the torrent that settled them, so pass them too.
+    """
+    sizes = {r.size for r in reservations}
+    by_size: dict[int, list[int]] = {}
+    for row, size in enumerate(snapshot.size):
+        if size in sizes:
+            by_size.setdefault(size, []).append(row)
+    matched = []
+    # settled reservations claim their torrents first
+    ordered = sorted(reservations, key=lambda r: r.settled_at is None)
+    for reservation in ordered:
+        rows = by_size.get(reservation.size, [])
+        for i, row in enumerate(rows):
+            if (
+                reservation.label in snapshot.labels(row)
+                and snapshot.started_at[row] >= reservation.created_at - skew
+            ):
+                del rows[i]  # one torrent settles one reservation
+                if reservation.settled_at is None:
+                    matched.append(reservation)
+                break
+    return matched
+
+
+class ReservationLedger:
+    """In-memory ledger of admissions that the clients haven't picked up yet.
+
+    Totals are maintained incrementally so that looking up and adding reservations is O(1).
+    A reconciled reservation is settled rather than released: it stays in the totals
+    until no snapshot in use is older than the one that settled it, and is kept
+    until it expires so its torrent can't settle another reservation.
+    """
+
+    # torrents started this long before a reservation may still reconcile it
+    CLOCK_SKEW = 60  # seconds
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.ids = itertools.count()
+        self.reservations: dict[int, Reservation] = {}
+        self.expiry: dict[str, deque[Reservation]] = {}  # client -> by expiry
+        # client -> heap of (settled_at, id, reservation) still in the totals
+        self.settling: dict[str, list[tuple[float, int, Reservation]]] = {}
+        self.uncounted: set[int] = set()  # settled and out of the totals
+        self.client_sizes: dict[str, int] = {}
+        self.tracker_sizes: dict[tuple[str, str], int] = {}
+        self.tracker_counts: dict[tuple[str, str], int] = {}
+
+    def _release(self, reservation: Reservation):
+        if self.reservations.pop(reservation.id, None) is None:
+            return
+        if reservation.id in self.uncounted:
+            self.uncounted.remove(reservation.id)
+        else:
+            self._untotal(reservation)
+
+    def _untotal(self, reservation: Reservation):
+        key = (reservation.client, reservation.tracker)
+        self.client_sizes[reservation.client] -= reservation.size
+        self.tracker_sizes[key] -= reservation.size
+        self.tracker_counts[key] -= 1
+
+    def _expire(self, client: str):
+        queue = self.expiry.get(client)
+        now = time.monotonic()
+        while queue and queue[0].expires_at <= now:
+            self._release(queue.popleft())
+
+    def _drop_settled(self, client: str, as_of: float):
+        heap = self.settling.get(client)
+        while heap and heap[0][0] <= as_of:
+            _, id, reservation = heapq.heappop(heap)
+            if id in self.reservations:  # not released or expired since
+                self._untotal(reservation)
+                self.uncounted.add(id)
+
+    def pending(self, client: str, tracker: str, as_of: float | None = None) -> Pending:
+        """Capacity reserved on the client and on its tracker.
+
+        as_of is the listing time (epoch seconds, now by default) of the oldest
+        snapshot checks may still evaluate. Reservations settled by snapshots
+        listed until then are dropped from the totals, later ones keep counting.
+        """
+        as_of = time.time() if as_of is None else as_of
+        with self.lock:
+            self._expire(client)
+            self._drop_settled(client, as_of)
+            key = (client, tracker)
+            return Pending(
+                client_size=self.client_sizes.get(client, 0),
+                size=self.tracker_sizes.get(key, 0),
+                count=self.tracker_counts.get(key, 0),
+            )
+
+    def reserve(
+        self, client: str, tracker: str, label: str, size: int, ttl: float
+    ) -> Reservation:
+        """Hold size bytes and a download slot until reconciled or ttl seconds pass."""
+        with self.lock:
+            reservation = Reservation(next(self.ids), client, tracker, label, size, ttl)
+            key = (client, tracker)
+            self.reservations[reservation.id] = reservation
+            # reservations share their client's ttl, so each queue stays sorted by expiry
+            self.expiry.setdefault(client, deque()).append(reservation)
+            self.client_sizes[client] = self.client_sizes.get(client, 0) + size
+            self.tracker_sizes[key] = self.tracker_sizes.get(key, 0) + size
+            self.tracker_counts[key] = self.tracker_counts.get(key, 0) + 1
+            return reservation
+
+    def release(self, reservation: Reservation):
+        """Give up a reservation, e.g. for an admission that fell through."""
+        with self.lock:
+            self._release(reservation)
+
+    def reconcile(
+        self, client: str, snapshot: Snapshot, fetched_at: float | None = None
+    ):
+        """Settle reservations matched by a torrent of the same size and label
+        in a snapshot listed at fetched_at (epoch seconds, now by default)."""
+        fetched_at = time.time() if fetched_at is None else fetched_at
+        with self.lock:
+            self._expire(client)
+            candidates = [r for r in self.reservations.values() if r.client == client]
+            if not candidates:
+                return
+            heap = self.settling.setdefault(client, [])
+            for reservation in settled(candidates, snapshot, self.CLOCK_SKEW):
+                reservation.settled_at = fetched_at
+                heapq.heappush(heap, (fetched_at, reservation.id, reservation))
@@ -1,20 +1,136 @@
 import xmlrpc.client
 import urllib.parse
 import re
-from datetime import datetime
+import threading
+from typing import TYPE_CHECKING, Callable
 from client import Client
+from metrics import RPCS
+from multicall import MulticallParser
+from scgi import SCGITransport
+from snapshot import Snapshot
 from torrent import Torrent
 
+if TYPE_CHECKING:
+    from async_xmlrpc import AsyncXMLRPC
+
+
+FIELDS = (
+    "d.hash=",
+    "d.name=",
+    "d.custom1=",
+    "d.timestamp.started=",
+    "d.timestamp.finished=",
+    "d.size_bytes=",
+    "d.down.total=",
+    "d.up.total=",
+    "d.down.rate=",
+    "d.up.rate=",
+    "d.message=",
+    "d.is_open=",
+    "d.is_active=",
+)
+
+# method.set_key arguments of the hook erasing files of removed torrents
+ERASE_HOOK = (
+    "",
+    "event.download.erased",
+    "delete_erased",
+    "execute=rm,-rf,--,$d.base_path=",
+)
+
+
+METHOD_NAME = re.compile(rb"<methodName>([^<]*)</methodName>")
+TRACKER_ERROR = re.compile(r"Tracker: \[(.*)\]$")  # d.message of tracker errors
+
+
+class _CountingMixin:
+    """Count the calls sent through the transport."""
+
+    def request(self, host, handler, request_body, verbose=False):
+        method = METHOD_NAME.search(request_body)
+        RPCS.inc(backend="rtorrent", method=method.group(1).decode() if method else "")
+        return super().request(host, handler, request_body, verbose)
+
+
+class _ParserMixin:
+    """Lets a call parse its response with its own parser, e.g. a MulticallParser."""
+
+    parser: MulticallParser | None = None
+
+    def getparser(self):
+        if self.parser is not None:
+            return self.parser, self.parser
+        return super().getparser()
+
+
+class _TimeoutMixin:
+    timeout: float | None = None
+
+    def make_connection(self, host):
+        connection = super().make_connection(host)
+        connection.timeout = self.timeout  # applied when the connection opens
+        return connection
+
+
+class _Transport(_ParserMixin, _CountingMixin, _TimeoutMixin, xmlrpc.client.Transport):
+    pass
+
+
+class _SafeTransport(
+    _ParserMixin, _CountingMixin, _TimeoutMixin, xmlrpc.client.SafeTransport
+):
+    pass
+
+
+class _SCGITransport(_ParserMixin, _CountingMixin, SCGITransport):
+    pass
+
 
 class RTorrentClient(Client):
     def __init__(self, name: str, config: dict):
         super().__init__(name, config)
         auth = config.get("auth", None)
         url = config["url"]
-        if auth:
+        if auth and not url.startswith("scgi://"):
             auth = urllib.parse.quote(f"{auth['username']}:{auth['password']}")
             url = url.replace("://", f"://{auth}@")
-        self.proxy = xmlrpc.client.ServerProxy(url)
+        self.url = url
+        self.local = threading.local()
+        self.pool_size = config.get("connection_pool_size", 10)
+        self._rpc: "AsyncXMLRPC | None" = None
+
+    @property
+    def rpc(self) -> "AsyncXMLRPC":
+        """Client of the async methods, created on first use to keep asyncio out of the CLI."""
+        if self._rpc is None:
+            from async_xmlrpc import AsyncXMLRPC
+
+            self._rpc = AsyncXMLRPC(self.url, self.timeout, self.pool_size)
+        return self._rpc
+
+    @property
+    def proxy(self) -> xmlrpc.client.ServerProxy:
+        """XML-RPC proxy of the calling thread.
+
+        Proxies aren't thread-safe, so each thread keeps its own keep-alive connection.
+        """
+        proxy = getattr(self.local, "proxy", None)
+        if proxy is None:
+            if self.url.startswith("scgi://"):
+                # the URI is a placeholder, the transport knows where the socket is
+                transport = _SCGITransport.from_url(self.url, self.timeout)
+                proxy = xmlrpc.client.ServerProxy(
+                    "http://rtorrent/RPC2", transport=transport
+                )
+            else:
+                if self.url.startswith("https://"):
+                    transport = _SafeTransport()
+                else:
+                    transport = _Transport()
+                transport.timeout = self.timeout
+                proxy = xmlrpc.client.ServerProxy(self.url, transport=transport)
+            self.local.proxy = proxy
+        return proxy
 
     def _get_status(self, is_open: bool, is_active: bool, msg: str) -> str:
         """Get the status of the torrent."""
@@ -26,32 +142,45 @@ class RTorrentClient(Client):
             return "PAUSED"
         return "STOPPED"
 
-    def list_torrents(self) -> list[Torrent]:
+    def list_torrents(self) -> Snapshot:
         """List torrents."""
-        raw_torrents = self.proxy.d.multicall2(
-            "",
-            "",
-            "d.hash=",
-            "d.name=",
-            "d.custom1=",
-            "d.timestamp.started=",
-            "d.timestamp.finished=",
-            "d.size_bytes=",
-            "d.down.total=",
-            "d.up.total=",
-            "d.down.rate=",
-            "d.up.rate=",
-            "d.message=",
-            "d.is_open=",
-            "d.is_active=",
-        )
-        torrents = [
-            Torrent(
+        snapshot = Snapshot()
+        transport = self.proxy("transport")
+        # rows go straight into the snapshot as the response streams in
+        transport.parser = MulticallParser(self._appender(snapshot))
+        try:
+            self.proxy.d.multicall2("", "", *FIELDS)
+        finally:
+            transport.parser = None
+        return snapshot
+
+    async def list_torrents_async(self) -> Snapshot:
+        snapshot = Snapshot()
+        parser = MulticallParser(self._appender(snapshot))
+        await self.rpc.call("d.multicall2", "", "", *FIELDS, parser=parser)
+        return snapshot
+
+    def _appender(self, snapshot: Snapshot) -> Callable[[list], None]:
+        """Row handler appending d.multicall2 rows over FIELDS to the snapshot.
+
+        Torrents without the required labels only add to the snapshot's other rates.
+        """
+        required = self.required_labels
+        unquote = urllib.parse.unquote
+
+        def append(entry: list):
+            labels = unquote(entry[2]).split(",") if entry[2] else []
+            if not required.issubset(labels):
+                snapshot.other_down_rate += float(entry[8]) * 8
+                snapshot.other_up_rate += float(entry[9]) * 8
+                return
+            error = TRACKER_ERROR.match(entry[10])  # "Tracker: [error message]"
+            snapshot.append(
                 infohash=entry[0],
                 name=entry[1],
-                labels=urllib.parse.unquote(entry[2]).split(",") if entry[2] else [],
-                started_at=datetime.fromtimestamp(entry[3]),
-                finished_at=datetime.fromtimestamp(entry[4]) if entry[4] > 0 else None,
+                labels=labels,
+                started_at=entry[3],
+                finished_at=entry[4] if entry[4] > 0 else 0,
                 size=int(entry[5]),
                 downloaded=int(entry[6]),  # bytes
                 uploaded=int(entry[7]),  # bytes
@@ -62,43 +191,111 @@ class RTorrentClient(Client):
                     is_active=entry[12] == "1",
                     msg=entry[10],
                 ),
-                tracker_error=(
-                    re.search(r"^Tracker: \[(.*)\]$", entry[10]).group(1)
-                    if entry[10].startswith("Tracker: [")
-                    else None
-                ),  # "Tracker: [error message]"
+                tracker_error=error.group(1) if error else None,
             )
-            for entry in raw_torrents
-        ]
 
-        return torrents
+        return append
 
     def _hook_erase_event(self):
         """Add a hook that erases files when the torrent is removed."""
-        self.proxy.method.set_key(
-            "",
-            "event.download.erased",
-            "delete_erased",
-            "execute=rm,-rf,--,$d.base_path=",
-        )
+        self.proxy.method.set_key(*ERASE_HOOK)
 
     def _unhook_erase_event(self):
         """Remove the hook that erases files when the torrent is removed."""
-        self.proxy.method.set_key("", "event.download.erased", "delete_erased")
+        self.proxy.method.set_key(*ERASE_HOOK[:3])
 
     def announce(self, torrent: Torrent):
         """Announce to the tracker."""
         self.proxy.d.tracker_announce(torrent.infohash)
 
+    async def announce_async(self, torrent: Torrent):
+        await self.rpc.call("d.tracker_announce", torrent.infohash)
+
+    async def load_tracker_errors_async(self, torrents: list[Torrent]):
+        pass  # tracker errors come with the torrent list
+
+    async def is_faulted_async(self, torrent: Torrent) -> bool:
+        return self.is_faulted(torrent)
+
+    async def aclose(self):
+        if self._rpc is not None:
+            await self._rpc.aclose()
+
+    def _multicall_ok(self, reply: list | dict) -> bool:
+        """Unpack a system.multicall reply. Fault 1 means the torrent is gone already."""
+        if isinstance(reply, dict):
+            if reply["faultCode"] == 1:
+                return False
+            raise xmlrpc.client.Fault(reply["faultCode"], reply["faultString"])
+        return True
+
     def remove_torrent(self, torrent: Torrent) -> bool:
         """Remove a torrent by its infohash."""
+        return self.remove_torrents([torrent])[torrent.infohash]
+
+    async def remove_torrent_async(self, torrent: Torrent) -> bool:
+        return (await self.remove_torrents_async([torrent]))[torrent.infohash]
+
+    def remove_torrents(
+        self,
+        torrents: list[Torrent],
+        on_chunk: Callable[[dict[str, bool]], None] | None = None,
+        cancelled: threading.Event | None = None,
+    ) -> dict[str, bool]:
+        """Remove torrents in bulk. Returns success per infohash.
+
+        The erase hook is installed once around all chunks.
+        """
+        if not torrents:
+            return {}
+        self._hook_erase_event()
         try:
-            self.announce(torrent)  # update the tracker stats
-            self._hook_erase_event()
-            self.proxy.d.erase(torrent.infohash)
+            return super().remove_torrents(torrents, on_chunk, cancelled)
+        finally:
             self._unhook_erase_event()
-            return True
-        except xmlrpc.client.Fault as e:
-            if e.faultCode == 1:
-                return False
-            raise e
+
+    async def remove_torrents_async(
+        self,
+        torrents: list[Torrent],
+        on_chunk: Callable[[dict[str, bool]], None] | None = None,
+        cancelled: threading.Event | None = None,
+    ) -> dict[str, bool]:
+        if not torrents:
+            return {}
+        await self.rpc.call("method.set_key", *ERASE_HOOK)
+        try:
+            results = {}
+            for i in range(0, len(torrents), self.remove_chunk_size):
+                if cancelled is not None and cancelled.is_set():
+                    break
+                chunk = torrents[i : i + self.remove_chunk_size]
+                replies = await self.rpc.call(
+                    "system.multicall", self._remove_calls(chunk)
+                )
+                results.update(self._removed(chunk, replies))
+                if on_chunk is not None:
+                    on_chunk(results)
+            return results
+        finally:
+            await self.rpc.call("method.set_key", *ERASE_HOOK[:3])
+
+    def _remove_chunk(self, torrents: list[Torrent]) -> dict[str, bool]:
+        """Announce and erase a chunk of torrents in a single system.multicall."""
+        replies = self.proxy.system.multicall(self._remove_calls(torrents))
+        return self._removed(torrents, replies)
+
+    def _remove_calls(self, torrents: list[Torrent]) -> list[dict]:
+        # announce before erasing to update the tracker stats
+        return [
+            {"methodName": method, "params": [torrent.infohash]}
+            for torrent in torrents
+            for method in ("d.tracker_announce", "d.erase")
+        ]
+
+    def _removed(self, torrents: list[Torrent], replies: list) -> dict[str, bool]:
+        """Success per infohash from a system.multicall reply to _remove_calls."""
+        return {
+            torrent.infohash: self._multicall_ok(announced)
+            and self._multicall_ok(erased)
+            for torrent, announced, erased in zip(torrents, replies[::2], replies[1::2])
+        }
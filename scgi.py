@@ -0,0 +1,64 @@
+import socket
+import urllib.parse
+import xmlrpc.client
+
+
+class SCGITransport(xmlrpc.client.Transport):
+    """XML-RPC transport talking SCGI straight to rTorrent's socket.
+
+    The address is a unix socket path or a (host, port) tuple.
+    rTorrent closes the connection after every reply, so each request opens a new one.
+    """
+
+    def __init__(self, address: str | tuple[str, int], timeout: float | None = None):
+        super().__init__()
+        self.address = address
+        self.timeout = timeout
+
+    @classmethod
+    def from_url(cls, url: str, timeout: float | None = None) -> "SCGITransport":
+        """Build a transport for scgi:///path/to/socket or scgi://host:port URLs."""
+        parsed = urllib.parse.urlsplit(url)
+        if parsed.scheme != "scgi":
+            raise ValueError(f"Not an SCGI URL: {url}")
+        if parsed.hostname:
+            if parsed.port is None:
+                raise ValueError(f"SCGI URL is missing a port: {url}")
+            return cls((parsed.hostname, parsed.port), timeout)
+        if not parsed.path:
+            raise ValueError(f"SCGI URL is missing a socket path: {url}")
+        return cls(urllib.parse.unquote(parsed.path), timeout)
+
+    def _connect(self) -> socket.socket:
+        if isinstance(self.address, str):
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.address)
+            return sock
+        return socket.create_connection(self.address, self.timeout)
+
+    @staticmethod
+    def encode(body: bytes, handler: str = "/RPC2") -> bytes:
+        """Wrap a request body in SCGI netstring headers."""
+        headers = (
+            f"CONTENT_LENGTH\0{len(body)}\0SCGI\x001\0"
+            f"REQUEST_METHOD\0POST\0REQUEST_URI\0{handler}\0"
+        ).encode()
+        return b"%d:%s," % (len(headers), headers) + body
+
+    def request(self, host, handler, request_body, verbose=False):
+        self.verbose = verbose
+        with self._connect() as sock:
+            sock.sendall(self.encode(request_body, handler))
+            with sock.makefile("rb") as response:
+                # CGI-style headers precede the body, e.g. "Status: 200 OK"
+                status = 200
+                while line := response.readline().strip():
+                    name, _, value = line.partition(b":")
+                    if name.strip().lower() == b"status":
+                        status = int(value.split()[0])
+                if status != 200:
+                    raise xmlrpc.client.ProtocolError(
+                        f"{host}{handler}", status, "SCGI request failed", {}
+                    )
+                return self.parse_response(response)
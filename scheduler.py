@@ -0,0 +1,126 @@
+import heapq
+import threading
+import time
+from collections import deque
+
+from application import Application
+from snapshot import Snapshot
+from snapshot_index import SnapshotIndex
+
+
+class RateHistory:
+    """Recent uploaded byte counters per torrent, to estimate upload rates from."""
+
+    def __init__(self, window: float):
+        self.window = window  # seconds
+        self.samples: dict[str, dict[str, deque[tuple[float, int]]]] = {}
+
+    def record(self, client: str, snapshot: Snapshot, now: float):
+        """Add a sample per torrent, forgetting torrents that are gone."""
+        previous = self.samples.get(client, {})
+        samples = {}
+        for infohash, uploaded in zip(snapshot.infohash, snapshot.uploaded):
+            history = previous.get(infohash)
+            if history is None:
+                history = deque()
+            history.append((now, uploaded))
+            while history[0][0] < now - self.window:
+                history.popleft()
+            samples[infohash] = history
+        self.samples[client] = samples
+
+    def rate(self, client: str, infohash: str) -> float | None:
+        """Average upload rate over the window in bytes per second, None if unknown."""
+        history = self.samples.get(client, {}).get(infohash)
+        if not history or len(history) < 2:
+            return None
+        (first_at, first), (last_at, last) = history[0], history[-1]
+        if last_at <= first_at:
+            return None
+        return max(last - first, 0) / (last_at - first_at)
+
+
+class Scheduler:
+    """Runs manage whenever a torrent is forecast to become satisfied.
+
+    Forecasts sit in a priority queue of (due, client, generation, infohash).
+    Refreshing a client bumps its generation, which invalidates its older entries.
+    Each client also gets an entry safety_interval after its last run,
+    which covers what can't be forecast such as tracker errors or upload rate thresholds.
+    """
+
+    def __init__(self, application: Application, delete: bool):
+        self.application = application
+        self.delete = delete
+        config = application.config.daemon
+        self.safety_interval = config.get("safety_interval_seconds", 3600)
+        self.min_interval = config.get("min_interval_seconds", 60)
+        self.history = RateHistory(config.get("rate_window_seconds", 6 * 3600))
+        self.queue: list[tuple[float, str, int, str]] = []
+        self.generations: dict[str, int] = {}
+        self.stopped = threading.Event()
+
+    def reschedule(self, client: str, now: float) -> int:
+        """Drop the client's queued forecasts and schedule its safety run.
+
+        Returns the client's new generation.
+        """
+        generation = self.generations[client] = self.generations.get(client, 0) + 1
+        heapq.heappush(self.queue, (now + self.safety_interval, client, generation, ""))
+        return generation
+
+    def forecast(self, client: str, index: SnapshotIndex, now: float):
+        """Queue the forecasts of a freshly managed client."""
+        generation = self.reschedule(client, now)
+        snapshot = index.torrents
+        trackers = self.application.trackers
+        for name, stats in index.trackers.items():
+            if not trackers[name].enabled:
+                continue
+            requirements = trackers[name].requirements
+            for row, satisfied in zip(stats.rows, stats.satisfied):
+                if satisfied:
+                    continue  # deleted, or kept by the client until the safety run
+                infohash = snapshot.infohash[row]
+                due = requirements.satisfied_at(
+                    snapshot, row, now, self.history.rate(client, infohash)
+                )
+                if due < now + self.safety_interval:
+                    heapq.heappush(self.queue, (due, client, generation, infohash))
+
+    def next_run(self) -> tuple[float, set[str]]:
+        """Time of the next run and the clients due then."""
+        queue = self.queue
+        while queue and queue[0][2] != self.generations[queue[0][1]]:
+            heapq.heappop(queue)
+        # run everything due within min_interval of the earliest forecast together
+        at = max(queue[0][0], time.time() + self.min_interval)
+        clients = set()
+        while queue and queue[0][0] <= at:
+            _, client, generation, _ = heapq.heappop(queue)
+            if generation == self.generations[client]:
+                clients.add(client)
+        return at, clients
+
+    def run(self):
+        """Manage all clients, then only the due ones when they're due, until stopped."""
+        clients = list(self.application.config.clients)
+        while not self.stopped.is_set():
+            indices = self.application.manage(self.delete, clients)
+            now = time.time()
+            for client in clients:
+                index = indices.get(client)
+                if index is None:  # failed, retry after the safety interval
+                    self.reschedule(client, now)
+                    continue
+                self.history.record(client, index.torrents, now)
+                self.forecast(client, index, now)
+            at, due = self.next_run()
+            self.application.logger.log(
+                f"Next run in {at - time.time():.0f}s ({', '.join(sorted(due))})."
+            )
+            self.stopped.wait(max(at - time.time(), 0))
+            clients = sorted(due)
+
+    def stop(self):
+        self.stopped.set()
@@ -1,15 +1,46 @@
 from flask import Flask, request
+from waitress import create_server
 from application import Application
+from jobs import JobManager
+from metrics import REGISTRY
 
 app = Flask("torrent-manager")
 
 
 @app.route("/", methods=["GET"])
 def manage():
-    """Manage torrents."""
+    """Start a manage job, or run it to completion with wait=1."""
     delete = request.args.get("delete", "0") == "1"
-    app.config["application"].manage(delete=delete)
-    return "OK\n", 200
+    job = app.config["jobs"].submit(
+        "manage", app.config["application"].manage, delete=delete
+    )
+    if request.args.get("wait", "0") == "1":
+        job.finished.wait()
+        if job.status == "failed":
+            return f"Failed: {job.error}\n", 500
+        return "OK\n", 200
+    return job.to_dict(), 202, {"Location": f"/jobs/{job.id}"}
+
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def job_status(job_id: str):
+    """Status of a background job."""
+    job = app.config["jobs"].get(job_id)
+    if job is None:
+        return "Unknown job.\n", 404
+    return job.to_dict(), 200
+
+
+@app.route("/cache", methods=["GET"])
+def cache():
+    """Snapshot cache statistics."""
+    return app.config["application"].snapshots.stats(), 200
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    """Metrics in the Prometheus text format."""
+    return REGISTRY.render(), 200, {"Content-Type": "text/plain; version=0.0.4"}
 
 
 @app.route("/", methods=["POST"])
@@ -32,14 +63,36 @@ def check():
         return f"Invalid parameters: {str(e)}\n", 400
 
 
+@app.route("/batch", methods=["POST"])
+def check_batch():
+    """Check many torrents in order, each taking up capacity for the ones after it."""
+    data = request.get_json(silent=True)
+    if not isinstance(data, list):
+        return "Expected a JSON list of objects with tracker, size, client.\n", 400
+    results = app.config["application"].check_batch(data)
+    return {
+        "results": [
+            {"ok": ok, "reason": reason, "message": msg} for ok, reason, msg in results
+        ]
+    }, 200
+
+
 class Server:
     """HTTP server."""
 
     def __init__(self, application: Application):
         self.host = application.config.server["host"]
         self.port = application.config.server["port"]
+        self.threads = application.config.server.get("threads", 8)
         app.config["application"] = application
+        app.config["jobs"] = JobManager(application.config.server.get("job_workers", 1))
+
+    def create(self):
+        """Create the WSGI server, listening but not serving yet."""
+        return create_server(app, host=self.host, port=self.port, threads=self.threads)
 
     def run(self):
         """Run the HTTP server."""
-        app.run(host=self.host, port=self.port, debug=False)
+        server = self.create()
+        print(f"Serving on http://{self.host}:{server.effective_port}")
+        server.run()
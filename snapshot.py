@@ -0,0 +1,97 @@
+import sys
+from array import array
+from typing import Iterator
+
+from torrent import Torrent
+
+
+class Snapshot:
+    """A client's torrent list stored column-wise in typed arrays.
+
+    Timestamps are epoch seconds (0 if unset), labels are interned into small-int ids.
+    Indexing or iterating yields Torrent views over the rows.
+    """
+
+    def __init__(self):
+        self.infohash: list[str] = []
+        self.name: list[str] = []
+        self.started_at = array("q")  # epoch seconds
+        self.finished_at = array("q")  # epoch seconds, 0 while downloading
+        self.size = array("q")  # bytes
+        self.downloaded = array("q")  # bytes
+        self.uploaded = array("q")  # bytes
+        self.down_rate = array("d")  # bps
+        self.up_rate = array("d")  # bps
+        self.state: list[str] = []
+        self.tracker_error: list[str | None] = []
+        self.tracker_error_loaded = bytearray()
+        self.label_names: list[str] = []  # label id -> label
+        self.label_ids: dict[str, int] = {}  # label -> label id
+        # labels of row i are label_data[label_offsets[i] : label_offsets[i + 1]]
+        self.label_offsets = array("I", [0])
+        self.label_data = array("H")
+        # rates of the client's torrents left out for lacking the required labels
+        self.other_down_rate = 0.0  # bps
+        self.other_up_rate = 0.0  # bps
+
+    def append(
+        self,
+        infohash: str,
+        name: str,
+        labels: list[str],
+        started_at: int,  # epoch seconds
+        finished_at: int,  # epoch seconds, 0 while downloading
+        size: int,  # bytes
+        downloaded: int,  # bytes
+        uploaded: int,  # bytes
+        down_rate: float,  # bps
+        up_rate: float,  # bps
+        state: str,
+        tracker_error: str | None,
+    ):
+        """Append a row."""
+        self.infohash.append(infohash)
+        self.name.append(name)
+        self.started_at.append(started_at)
+        self.finished_at.append(finished_at)
+        self.size.append(size)
+        self.downloaded.append(downloaded)
+        self.uploaded.append(uploaded)
+        self.down_rate.append(down_rate)
+        self.up_rate.append(up_rate)
+        self.state.append(sys.intern(state))
+        self.tracker_error.append(tracker_error)
+        self.tracker_error_loaded.append(tracker_error is not None)
+        for label in labels:
+            self.label_data.append(self.intern_label(label))
+        self.label_offsets.append(len(self.label_data))
+
+    def intern_label(self, label: str) -> int:
+        """Get the id of a label, assigning a new one if it's unknown."""
+        label_id = self.label_ids.get(label)
+        if label_id is None:
+            label_id = self.label_ids[label] = len(self.label_names)
+            self.label_names.append(label)
+        return label_id
+
+    def label_row_ids(self, row: int) -> array:
+        """Label ids of a row."""
+        return self.label_data[self.label_offsets[row] : self.label_offsets[row + 1]]
+
+    def labels(self, row: int) -> list[str]:
+        """Labels of a row."""
+        return [self.label_names[label_id] for label_id in self.label_row_ids(row)]
+
+    def __len__(self) -> int:
+        return len(self.infohash)
+
+    def __getitem__(self, row: int) -> Torrent:
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError("snapshot row out of range")
+        return Torrent.view(self, row)
+
+    def __iter__(self) -> Iterator[Torrent]:
+        for row in range(len(self)):
+            yield Torrent.view(self, row)
@@ -0,0 +1,192 @@
+from concurrent.futures import Executor, ThreadPoolExecutor
+import threading
+import time
+from typing import TYPE_CHECKING, Awaitable, Callable
+
+if TYPE_CHECKING:
+    import asyncio
+
+
+class _Flight:
+    """A fetch in progress that concurrent callers wait on."""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error: BaseException | None = None
+        self.waiters: list["asyncio.Future"] = []  # coroutines waiting on the fetch
+
+    def wait_async(self) -> "asyncio.Future":
+        """Get a future of the running loop resolved once the fetch is done."""
+        import asyncio  # only async callers pay for importing it
+
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        return waiter
+
+    def finish(self):
+        self.event.set()
+        for waiter in self.waiters:
+            try:
+                waiter.get_loop().call_soon_threadsafe(_resolve, waiter)
+            except RuntimeError:  # the waiter's loop is gone
+                pass
+
+
+def _resolve(waiter: "asyncio.Future"):
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+class SnapshotCache:
+    """Per-client torrent list cache with TTL expiry and single-flight refresh.
+
+    Stale values are refreshed on executor, by default a single long-lived worker,
+    so that clients keeping a connection per thread reuse it across refreshes.
+    """
+
+    def __init__(self, executor: Executor | None = None):
+        self.executor = executor or ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="snapshots"
+        )
+        self.lock = threading.Lock()
+        self.entries = {}  # key -> (fetched_at, value)
+        self.flights: dict[str, _Flight] = {}
+        self.generations: dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+
+    def get(self, key: str, fetch: Callable, ttl: float, stale: float = 0):
+        """Return the cached value for key, fetching it if expired.
+
+        Concurrent callers that miss on the same key share a single fetch.
+        A value expired for less than stale seconds is returned as is
+        while it's refreshed on the executor. A value with an age attribute
+        is cached as fetched that many seconds ago.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if (
+                stale > 0
+                and entry is not None
+                and time.monotonic() - entry[0] < ttl + stale
+            ):
+                hit, flight, generation = self._lookup(key, ttl)
+                if hit:
+                    return flight
+                self.stale_hits += 1
+                if generation is not None:
+                    self.executor.submit(self._refresh, key, fetch, flight, generation)
+                return entry[1]
+            hit, flight, generation = self._lookup(key, ttl)
+            if hit:
+                return flight
+        if generation is None:
+            flight.event.wait()
+            return self._outcome(flight)
+        try:
+            flight.result = fetch()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            self._land(key, flight, generation)
+        return flight.result
+
+    def _refresh(self, key: str, fetch: Callable, flight: _Flight, generation: int):
+        try:
+            flight.result = fetch()
+        except BaseException as e:
+            flight.error = e
+        finally:
+            self._land(key, flight, generation)
+
+    def peek(self, key: str):
+        """The value cached for key, expired or not, or None."""
+        with self.lock:
+            entry = self.entries.get(key)
+        return None if entry is None else entry[1]
+
+    def seed(self, key: str, value, age: float):
+        """Cache a value that was fetched age seconds ago, unless one is cached already."""
+        with self.lock:
+            if key not in self.entries:
+                self.entries[key] = (time.monotonic() - age, value)
+
+    async def get_async(self, key: str, fetch: Callable[[], Awaitable], ttl: float):
+        """Like get, with a coroutine fetch. Shares flights with threaded callers."""
+        import asyncio
+
+        with self.lock:
+            hit, flight, generation = self._lookup(key, ttl)
+            if hit:
+                return flight
+            if generation is None and not flight.event.is_set():
+                waiter = flight.wait_async()
+            else:
+                waiter = None
+        if generation is None:
+            if waiter is not None:
+                await waiter
+            return self._outcome(flight)
+        try:
+            flight.result = await fetch()
+        except asyncio.CancelledError:
+            flight.error = RuntimeError(f"Fetching {key} was cancelled.")
+            raise
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            self._land(key, flight, generation)
+        return flight.result
+
+    def _lookup(self, key: str, ttl: float) -> tuple[bool, object, int | None]:
+        """With the lock held: (True, value, None) on a hit, else (False, flight, generation).
+
+        The generation is None when joining another caller's flight.
+        """
+        entry = self.entries.get(key)
+        if entry is not None and time.monotonic() - entry[0] < ttl:
+            self.hits += 1
+            return True, entry[1], None
+        flight = self.flights.get(key)
+        if flight is not None:
+            self.hits += 1
+            return False, flight, None
+        self.misses += 1
+        flight = self.flights[key] = _Flight()
+        return False, flight, self.generations.get(key, 0)
+
+    def _outcome(self, flight: _Flight):
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    def _land(self, key: str, flight: _Flight, generation: int):
+        """Store a finished flight's result and release its waiters."""
+        with self.lock:
+            del self.flights[key]
+            # an invalidation during the fetch means the result may be stale
+            if flight.error is None and self.generations.get(key, 0) == generation:
+                age = getattr(flight.result, "age", 0)
+                self.entries[key] = (time.monotonic() - age, flight.result)
+            flight.finish()
+
+    def invalidate(self, key: str | None = None):
+        """Drop the cached value for key, or for every key if none is given."""
+        with self.lock:
+            keys = list(self.entries) + list(self.flights) if key is None else [key]
+            for k in keys:
+                self.entries.pop(k, None)
+                self.generations[k] = self.generations.get(k, 0) + 1
+
+    def stats(self) -> dict[str, int]:
+        """Cache hit/miss counters."""
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale_hits": self.stale_hits,
+            }
@@ -0,0 +1,84 @@
+from array import array
+import time
+from typing import TYPE_CHECKING
+
+from client import Client
+from snapshot import Snapshot
+from torrent import Torrent
+
+if TYPE_CHECKING:
+    from tracker import Tracker
+
+
+class TorrentStats:
+    """Rows of a client or tracker in a snapshot together with their aggregates."""
+
+    def __init__(self, snapshot: Snapshot):
+        self.snapshot = snapshot
+        self.rows = array("I")
+        self.satisfied = bytearray()  # tracker requirements, aligned with rows
+        self.size = 0  # bytes
+        self.downloaded = 0  # bytes
+        self.uploaded = 0  # bytes
+        self.down_rate = 0.0  # bps
+        self.up_rate = 0.0  # bps
+        self.unsatisfied = 0
+        self.downloading = 0
+
+    def add(self, row: int):
+        snapshot = self.snapshot
+        self.rows.append(row)
+        self.size += snapshot.size[row]
+        self.downloaded += snapshot.downloaded[row]
+        self.uploaded += snapshot.uploaded[row]
+        self.down_rate += snapshot.down_rate[row]
+        self.up_rate += snapshot.up_rate[row]
+        if snapshot.finished_at[row] == 0:
+            self.downloading += 1
+
+    @property
+    def torrents(self) -> list[Torrent]:
+        """Views of the rows."""
+        return [Torrent.view(self.snapshot, row) for row in self.rows]
+
+    def ratio(self) -> float:
+        """Calculate the aggregate upload/download ratio."""
+        return self.uploaded / (self.downloaded or 1)
+
+
+class SnapshotIndex:
+    """A client snapshot indexed by label and tracker, with aggregates built in one pass."""
+
+    def __init__(self, client: Client, snapshot: Snapshot, trackers: list["Tracker"]):
+        self.torrents = snapshot
+        self.age = 0.0  # seconds the snapshot was old when indexed
+        self.fetched_at = time.time()  # epoch time the snapshot was listed
+        # rows carrying the client's required labels
+        self.client = TorrentStats(snapshot)
+        self.trackers = {tracker.name: TorrentStats(snapshot) for tracker in trackers}
+        # rate caps apply to every torrent as they share the same network interface
+        self.down_rate = sum(snapshot.down_rate) + snapshot.other_down_rate
+        self.up_rate = sum(snapshot.up_rate) + snapshot.other_up_rate
+        trackers_by_label: list[list["Tracker"]] = [[] for _ in snapshot.label_names]
+        for tracker in trackers:
+            label_id = snapshot.label_ids.get(tracker.label)
+            if label_id is not None:
+                trackers_by_label[label_id].append(tracker)
+        required = {snapshot.label_ids.get(label) for label in client.required_labels}
+        # a required label missing from the snapshot means no row qualifies
+        qualify = None not in required
+        offsets, data = snapshot.label_offsets, snapshot.label_data
+        for row in range(len(snapshot)):
+            label_ids = set(data[offsets[row] : offsets[row + 1]])
+            if not qualify or not required <= label_ids:
+                continue
+            self.client.add(row)
+            for label_id in label_ids:
+                for tracker in trackers_by_label[label_id]:
+                    self.trackers[tracker.name].add(row)
+        # evaluate requirements per tracker in one batch against a single clock reading
+        now = time.time()
+        for tracker in trackers:
+            stats = self.trackers[tracker.name]
+            stats.satisfied = tracker.requirements.mask(snapshot, stats.rows, now)
+            stats.unsatisfied = len(stats.rows) - sum(stats.satisfied)
@@ -0,0 +1,413 @@
+import fcntl
+import json
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+from array import array
+from typing import BinaryIO
+
+from reservations import Pending, Reservation, ReservationLedger, settled
+from snapshot import Snapshot
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS samples (
+    client TEXT NOT NULL,
+    infohash TEXT NOT NULL,
+    at REAL NOT NULL,
+    uploaded INTEGER NOT NULL,
+    downloaded INTEGER NOT NULL,
+    up_rate REAL NOT NULL,
+    down_rate REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS samples_by_torrent ON samples (client, infohash, at);
+CREATE INDEX IF NOT EXISTS samples_by_time ON samples (at);
+CREATE TABLE IF NOT EXISTS snapshots (
+    client TEXT PRIMARY KEY,
+    fetched_at REAL NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sampled (
+    client TEXT PRIMARY KEY,
+    at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS invalidated (
+    client TEXT PRIMARY KEY,
+    at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS reservations (
+    id INTEGER PRIMARY KEY,
+    client TEXT NOT NULL,
+    tracker TEXT NOT NULL,
+    label TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    settled_at REAL
+);
+CREATE INDEX IF NOT EXISTS reservations_by_client ON reservations (client, expires_at);
+"""
+
+# Snapshot attributes persisted as JSON lists
+COLUMNS = (
+    "infohash",
+    "name",
+    "started_at",
+    "finished_at",
+    "size",
+    "downloaded",
+    "uploaded",
+    "down_rate",
+    "up_rate",
+    "state",
+    "tracker_error",
+    "label_names",
+    "label_offsets",
+    "label_data",
+)
+
+# scalar Snapshot attributes
+TOTALS = ("other_down_rate", "other_up_rate")
+
+
+def dump_snapshot(snapshot: Snapshot) -> str:
+    data = {name: list(getattr(snapshot, name)) for name in COLUMNS}
+    data.update((name, getattr(snapshot, name)) for name in TOTALS)
+    return json.dumps(data)
+
+
+def load_snapshot(data: str) -> Snapshot:
+    columns = json.loads(data)
+    snapshot = Snapshot()
+    for name in COLUMNS:
+        column = getattr(snapshot, name)
+        if isinstance(column, array):
+            column = array(column.typecode, columns[name])
+        else:
+            column = columns[name]
+        setattr(snapshot, name, column)
+    for name in TOTALS:
+        setattr(snapshot, name, columns.get(name, 0.0))
+    snapshot.state = [sys.intern(state) for state in snapshot.state]
+    snapshot.tracker_error_loaded = bytearray(
+        error is not None for error in snapshot.tracker_error
+    )
+    snapshot.label_ids = {label: i for i, label in enumerate(snapshot.label_names)}
+    return snapshot
+
+
+class HostLock:
+    """A named lock held across the threads and processes of a host.
+
+    Threads queue on a reentrant thread lock, processes on an fcntl record
+    lock over one byte of a shared lock file, at an offset hashed from the name.
+    """
+
+    def __init__(self, file: BinaryIO, name: str):
+        self.file = file
+        self.offset = zlib.crc32(name.encode())
+        self.local = threading.RLock()
+        self.depth = 0  # acquisitions by the owning thread
+
+    def acquire(self, blocking: bool = True) -> bool:
+        if not self.local.acquire(blocking):
+            return False
+        if self.depth == 0:
+            try:
+                flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+                fcntl.lockf(self.file, flags, 1, self.offset)
+            except BaseException as e:
+                self.local.release()
+                if isinstance(e, (BlockingIOError, PermissionError)) and not blocking:
+                    return False
+                raise
+        self.depth += 1
+        return True
+
+    def release(self):
+        self.depth -= 1
+        if self.depth == 0:
+            fcntl.lockf(self.file, fcntl.LOCK_UN, 1, self.offset)
+        self.local.release()
+
+    def __enter__(self) -> "HostLock":
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+class StateStore:
+    """SQLite store of per-torrent samples and the last snapshot of every client.
+
+    Samples are taken at most every sample_interval seconds per client, by
+    whichever process using the database gets there first, kept for retention
+    seconds and compacted at most hourly per client.
+    """
+
+    COMPACT_INTERVAL = 3600  # seconds
+
+    def __init__(
+        self,
+        path: str,
+        sample_interval: float = 300,
+        window: float = 1800,
+        retention: float = 7 * 86400,
+    ):
+        self.sample_interval = sample_interval
+        self.window = window  # seconds averaged over by rates()
+        self.retention = retention
+        self.path = path
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        # incremental vacuuming only takes effect on a fresh database
+        self.db.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        self.db.execute("PRAGMA journal_mode = WAL")
+        self.db.executescript(SCHEMA)
+        self.compacted_at: dict[str, float] = {}
+        self.lock_file: BinaryIO | None = None
+        self.host_locks: dict[str, HostLock] = {}
+
+    def host_lock(self, name: str) -> HostLock:
+        """The lock called name, shared with every process using the database."""
+        with self.lock:
+            lock = self.host_locks.get(name)
+            if lock is None:
+                if self.lock_file is None:
+                    self.lock_file = open(f"{self.path}-lock", "a+b")
+                lock = self.host_locks[name] = HostLock(self.lock_file, name)
+            return lock
+
+    def record(
+        self,
+        client: str,
+        snapshot: Snapshot,
+        now: float | None = None,
+        publish: bool = False,
+    ):
+        """Sample the snapshot and keep it for warm starts, unless sampled recently.
+
+        A published snapshot is kept either way, for other processes to share.
+        """
+        now = time.time() if now is None else now
+        with self.lock, self.db:
+            # taking the write lock up front makes the interval check hold across processes
+            self.db.execute("BEGIN IMMEDIATE")
+            row = self.db.execute(
+                "SELECT at FROM sampled WHERE client = ?", (client,)
+            ).fetchone()
+            sample = row is None or now - row[0] >= self.sample_interval
+            if sample:
+                self.db.execute(
+                    "INSERT OR REPLACE INTO sampled VALUES (?, ?)", (client, now)
+                )
+                self.db.executemany(
+                    "INSERT INTO samples VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    zip(
+                        [client] * len(snapshot),
+                        snapshot.infohash,
+                        [now] * len(snapshot),
+                        snapshot.uploaded,
+                        snapshot.downloaded,
+                        snapshot.up_rate,
+                        snapshot.down_rate,
+                    ),
+                )
+            if sample or publish:
+                self.db.execute(
+                    "INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?)",
+                    (client, now, dump_snapshot(snapshot)),
+                )
+        if sample and now - self.compacted_at.get(client, 0) >= self.COMPACT_INTERVAL:
+            with self.lock:
+                self._compact(client, snapshot, now)
+
+    def _compact(self, client: str, snapshot: Snapshot, now: float):
+        """Drop expired samples and those of the client's torrents that are gone."""
+        self.compacted_at[client] = now
+        with self.db:
+            self.db.execute("DELETE FROM samples WHERE at < ?", (now - self.retention,))
+            self.db.execute("CREATE TEMP TABLE IF NOT EXISTS present (infohash TEXT)")
+            self.db.execute("DELETE FROM present")
+            self.db.executemany(
+                "INSERT INTO present VALUES (?)", ((h,) for h in snapshot.infohash)
+            )
+            self.db.execute(
+                "DELETE FROM samples WHERE client = ? AND infohash NOT IN (SELECT infohash FROM present)",
+                (client,),
+            )
+        self.db.execute("PRAGMA incremental_vacuum")
+
+    def rates(
+        self, client: str, now: float | None = None
+    ) -> dict[str, tuple[int, float, float]]:
+        """Sample count and summed (up, down) rates per infohash over the window.
+
+        Samples taken at now are left out.
+        """
+        now = time.time() if now is None else now
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT infohash, COUNT(*), SUM(up_rate), SUM(down_rate) FROM samples "
+                "WHERE client = ? AND at >= ? AND at != ? GROUP BY infohash",
+                (client, now - self.window, now),
+            ).fetchall()
+        return {infohash: (count, up, down) for infohash, count, up, down in rows}
+
+    def smooth(self, client: str, snapshot: Snapshot, now: float | None = None):
+        """Replace the snapshot's rate columns with their averages over the window.
+
+        The snapshot, listed at now, counts as a sample whether it was recorded yet
+        or not. The columns are replaced, not updated in place, so copies of the
+        snapshot taken before keep the rates as listed.
+        """
+        now = time.time() if now is None else now
+        rates = self.rates(client, now)
+        up_rate = array("d", snapshot.up_rate)
+        down_rate = array("d", snapshot.down_rate)
+        for row, infohash in enumerate(snapshot.infohash):
+            sampled = rates.get(infohash)
+            if sampled is not None:
+                count, up, down = sampled
+                up_rate[row] = (up + up_rate[row]) / (count + 1)
+                down_rate[row] = (down + down_rate[row]) / (count + 1)
+        snapshot.up_rate, snapshot.down_rate = up_rate, down_rate
+
+    def last_snapshot(self, client: str) -> tuple[float, Snapshot] | None:
+        """The last recorded snapshot of a client and its epoch time."""
+        with self.lock:
+            row = self.db.execute(
+                "SELECT fetched_at, data FROM snapshots WHERE client = ?", (client,)
+            ).fetchone()
+        if row is None:
+            return None
+        return row[0], load_snapshot(row[1])
+
+    def fresh_snapshot(
+        self, client: str, max_age: float, now: float | None = None
+    ) -> tuple[float, Snapshot] | None:
+        """The client's last snapshot and its epoch time, if under max_age seconds old
+        and recorded since the client was last invalidated."""
+        now = time.time() if now is None else now
+        with self.lock:
+            row = self.db.execute(
+                "SELECT s.fetched_at, s.data FROM snapshots s "
+                "LEFT JOIN invalidated i ON i.client = s.client "
+                "WHERE s.client = ? AND s.fetched_at > ? AND s.fetched_at > COALESCE(i.at, 0)",
+                (client, now - max_age),
+            ).fetchone()
+        if row is None:
+            return None
+        return row[0], load_snapshot(row[1])
+
+    def invalidated_at(self, client: str) -> float:
+        """Epoch time the client was last invalidated, 0 if never."""
+        with self.lock:
+            row = self.db.execute(
+                "SELECT at FROM invalidated WHERE client = ?", (client,)
+            ).fetchone()
+        return 0.0 if row is None else row[0]
+
+    def invalidate(self, client: str):
+        """Stop fresh_snapshot from returning the snapshots recorded so far."""
+        with self.lock, self.db:
+            self.db.execute(
+                "INSERT OR REPLACE INTO invalidated VALUES (?, ?)",
+                (client, time.time()),
+            )
+
+
+class SharedReservationLedger:
+    """Reservation ledger kept in the state database, shared by every process using it.
+
+    Its lock is a host lock, so checks that evaluate and reserve under it see
+    the approvals of other processes too. Expiry uses epoch time.
+    Like in ReservationLedger, reconciled reservations are settled, not deleted,
+    as other processes may still be evaluating snapshots listed before.
+    """
+
+    CLOCK_SKEW = ReservationLedger.CLOCK_SKEW
+
+    def __init__(self, store: StateStore):
+        self.store = store
+        self.lock = store.host_lock("reservations")
+
+    def pending(self, client: str, tracker: str, as_of: float | None = None) -> Pending:
+        """Capacity reserved on the client and on its tracker.
+
+        as_of is the listing time (epoch seconds, now by default) of the oldest
+        snapshot the caller evaluates. Reservations settled by snapshots listed after
+        it count too.
+        """
+        now = time.time()
+        as_of = now if as_of is None else as_of
+        with self.lock, self.store.lock:
+            client_size, size, count = self.store.db.execute(
+                "SELECT COALESCE(SUM(size), 0), "
+                "COALESCE(SUM(CASE WHEN tracker = ? THEN size END), 0), "
+                "COUNT(CASE WHEN tracker = ? THEN 1 END) "
+                "FROM reservations WHERE client = ? AND expires_at > ? "
+                "AND (settled_at IS NULL OR settled_at > ?)",
+                (tracker, tracker, client, now, as_of),
+            ).fetchone()
+        return Pending(client_size, size, count)
+
+    def reserve(
+        self, client: str, tracker: str, label: str, size: int, ttl: float
+    ) -> Reservation:
+        """Hold size bytes and a download slot until reconciled or ttl seconds pass."""
+        now = time.time()
+        with self.lock, self.store.lock, self.store.db:
+            cursor = self.store.db.execute(
+                "INSERT INTO reservations (client, tracker, label, size, created_at, expires_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (client, tracker, label, size, now, now + ttl),
+            )
+        return Reservation(cursor.lastrowid, client, tracker, label, size, ttl, now)
+
+    def release(self, reservation: Reservation):
+        """Give up a reservation, e.g. for an admission that fell through."""
+        with self.lock, self.store.lock, self.store.db:
+            self.store.db.execute(
+                "DELETE FROM reservations WHERE id = ?", (reservation.id,)
+            )
+
+    def reconcile(
+        self, client: str, snapshot: Snapshot, fetched_at: float | None = None
+    ):
+        """Settle reservations matched by a torrent of the same size and label
+        in a snapshot listed at fetched_at (epoch seconds, now by default),
+        and delete expired ones."""
+        now = time.time()
+        fetched_at = now if fetched_at is None else fetched_at
+        with self.lock:
+            with self.store.lock:
+                rows = self.store.db.execute(
+                    "SELECT id, tracker, label, size, created_at, expires_at, settled_at "
+                    "FROM reservations WHERE client = ?",
+                    (client,),
+                ).fetchall()
+            if not rows:
+                return
+            expired = [row[0] for row in rows if row[5] <= now]
+            candidates = []
+            for id, tracker, label, size, created_at, expires_at, settled_at in rows:
+                if expires_at > now:
+                    reservation = Reservation(
+                        id, client, tracker, label, size, expires_at - now, created_at
+                    )
+                    reservation.settled_at = settled_at
+                    candidates.append(reservation)
+            matched = settled(candidates, snapshot, self.CLOCK_SKEW)
+            if expired or matched:
+                with self.store.lock, self.store.db:
+                    self.store.db.executemany(
+                        "DELETE FROM reservations WHERE id = ?",
+                        ((id,) for id in expired),
+                    )
+                    self.store.db.executemany(
+                        "UPDATE reservations SET settled_at = ? WHERE id = ?",
+                        ((fetched_at, r.id) for r in matched),
+                    )
@@ -0,0 +1,17 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.fakes import FakeRTorrent, synthetic_torrents  # noqa: E402
+
+
+@pytest.fixture
+def rtorrent():
+    """A fake rTorrent with 100 torrents across aither and tl."""
+    fake = FakeRTorrent(synthetic_torrents(100, ["aither", "tl"], ["automated"]))
+    yield fake.start()
+    fake.stop()
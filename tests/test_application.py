@@ -0,0 +1,139 @@
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from benchmarks.fakes import write_config
+
+ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+
+def test_warm_start_leaves_unused_backends_unimported(tmp_path):
+    config = write_config(
+        str(tmp_path),
+        {
+            "rt": {"type": "rtorrent", "url": "http://127.0.0.1:1/RPC2"},
+            "qbt": {"type": "qbittorrent", "url": "http://127.0.0.1:1"},
+        },
+        ["aither"],
+        {
+            "clients": {"storage_cap_gb": 1},
+            "state": {"path": str(tmp_path / "state.db")},
+        },
+    )
+    code = (
+        "import sys; from application import Application; "
+        f"Application({config!r}); print('qbittorrentapi' in sys.modules)"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == "False"
+
+
+def test_warm_start_seeds_clients_serving_stale_snapshots(tmp_path, rtorrent):
+    from application import Application
+
+    config = write_config(
+        str(tmp_path),
+        {"rt": {"type": "rtorrent", "url": rtorrent.url, "stale_seconds": 3600}},
+        ["aither", "tl"],
+        {
+            "clients": {"storage_cap_gb": 1 << 20},
+            "state": {"path": str(tmp_path / "state.db")},
+        },
+    )
+    first = Application(config)
+    first.check("rt", "aither", 1 << 30)
+    first.worker.shutdown()  # the snapshot is recorded in the background
+    second = Application(config)
+    assert "rt" in second.snapshots.entries
+    assert "rt" in second.clients
+
+
+@pytest.mark.parametrize("shared", [False, True])
+def test_failed_eviction_releases_its_reservation(tmp_path, rtorrent, shared):
+    from application import Application
+
+    def config(storage_cap_gb: float) -> str:
+        return write_config(
+            str(tmp_path),
+            {
+                "rt": {
+                    "type": "rtorrent",
+                    "url": rtorrent.url,
+                    "storage_cap_gb": storage_cap_gb,
+                    "evict_on_demand": True,
+                }
+            },
+            ["aither", "tl"],
+            {
+                "clients": {"reservation_ttl_seconds": 300},
+                "state": {"path": str(tmp_path / "state.db"), "shared": shared},
+            },
+        )
+
+    probe = Application(config(1 << 20))
+    used = probe.snapshot(probe.client("rt")).client.size
+    app = Application(config(used / (1 << 30)))  # full, so a check has to evict
+    client = app.client("rt")
+
+    def unreachable(torrents):
+        raise ConnectionError("client unreachable")
+
+    client.remove_torrents = unreachable
+    ok, err = app.check("rt", "tl", 5 << 30)
+    assert not ok
+    assert "client unreachable" in err
+    pending = app.reservations.pending("rt", "tl")
+    assert (pending.client_size, pending.size, pending.count) == (0, 0, 0)
+
+
+def test_refreshes_and_records_run_on_one_worker(tmp_path, rtorrent):
+    import threading
+
+    from application import Application
+
+    config = write_config(
+        str(tmp_path),
+        {
+            "rt": {
+                "type": "rtorrent",
+                "url": rtorrent.url,
+                "snapshot_ttl_seconds": 0.05,
+                "stale_seconds": 3600,
+            }
+        },
+        ["aither", "tl"],
+        {
+            "clients": {"storage_cap_gb": 1 << 20},
+            "state": {"path": str(tmp_path / "state.db"), "sample_interval_seconds": 0},
+        },
+    )
+    app = Application(config)
+    client = app.client("rt")
+    listed, recorded = [], []
+    list_torrents, record = client.list_torrents, app.state.record
+
+    def listing():
+        listed.append(threading.current_thread())
+        return list_torrents()
+
+    def recording(*args, **kwargs):
+        recorded.append(threading.current_thread())
+        return record(*args, **kwargs)
+
+    client.list_torrents, app.state.record = listing, recording
+
+    app.check("rt", "aither", 1 << 30)  # listed on the checking thread
+    for _ in range(5):
+        time.sleep(0.1)
+        app.check("rt", "aither", 1 << 30)  # stale, refreshed in the background
+    app.worker.shutdown()
+    assert listed[0] is threading.current_thread()
+    assert len(listed) > 2
+    assert len(set(listed[1:])) == 1
+    assert set(recorded) == set(listed[1:])
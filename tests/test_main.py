@@ -0,0 +1,43 @@
+import json
+import os
+import subprocess
+import sys
+
+from benchmarks.fakes import write_config
+
+ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+
+def run(*args: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, os.path.join(ROOT, "main.py"), *args],
+        capture_output=True,
+        text=True,
+    )
+
+
+def test_batch_rejects_malformed_lines_only(tmp_path, rtorrent):
+    config = write_config(
+        str(tmp_path),
+        {"rt": {"type": "rtorrent", "url": rtorrent.url, "storage_cap_gb": 1 << 20}},
+        ["aither", "tl"],
+        {"state": {"path": str(tmp_path / "state.db")}},
+    )
+    batch = tmp_path / "batch.jsonl"
+    batch.write_text(
+        '{"client": "rt", "tracker": "aither", "size": 1073741824}\n'
+        '{"client": "rt", "tracker": \n'
+        '{"client": "rt", "tracker": "tl", "size": 1073741824}\n'
+    )
+    result = run("--config", config, "check", "--batch", str(batch))
+    decisions = [json.loads(line) for line in result.stdout.splitlines()]
+    assert [d["reason"] for d in decisions] == ["ok", "invalid", "ok"]
+    assert decisions[1]["message"].startswith("Invalid JSON")
+    assert decisions[2]["tracker"] == "tl"
+    assert result.returncode == 1
+
+
+def test_batch_excludes_single_check_arguments(tmp_path):
+    result = run("check", "--batch", "-", "--client", "rt")
+    assert result.returncode == 2
+    assert "--batch can't be combined" in result.stderr
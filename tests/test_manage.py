@@ -0,0 +1,97 @@
+import time
+
+from application import Application
+from benchmarks.fakes import synthetic_torrents, write_config
+from benchmarks.snapshot_memory import build_snapshot
+from client import Client
+from snapshot import Snapshot
+from torrent import Torrent
+
+
+class SlowClient(Client):
+    """A client on the thread-backed *_async fallbacks, with slow calls."""
+
+    def __init__(self, name: str, config: dict, list_delay: float, chunk_delay: float):
+        super().__init__(name, config)
+        self.list_delay = list_delay
+        self.chunk_delay = chunk_delay
+        self.snapshot = build_snapshot(
+            synthetic_torrents(20, ["aither"], ["automated"])
+        )
+        self.removed: list[str] = []
+
+    def list_torrents(self) -> Snapshot:
+        time.sleep(self.list_delay)
+        return self.snapshot
+
+    def remove_torrent(self, torrent: Torrent) -> bool:
+        time.sleep(self.chunk_delay)
+        self.removed.append(torrent.infohash)
+        return True
+
+    def announce(self, torrent: Torrent):
+        pass
+
+
+def application(tmp_path, list_delay: float = 0, chunk_delay: float = 0):
+    config = write_config(
+        str(tmp_path),
+        {
+            "slow": {
+                "type": "rtorrent",
+                "url": "http://127.0.0.1:1/RPC2",
+                "storage_cap_gb": 1 << 20,
+                "manage_timeout_seconds": 0.5,
+                "remove_chunk_size": 1,
+            }
+        },
+        ["aither"],
+    )
+    app = Application(config)
+    client_config = app.config.clients["slow"]
+    app.clients["slow"] = SlowClient("slow", client_config, list_delay, chunk_delay)
+    return app
+
+
+def test_timeout_does_not_wait_for_a_hung_thread(tmp_path):
+    app = application(tmp_path, list_delay=3)
+    start = time.perf_counter()
+    indices = app.manage()
+    assert time.perf_counter() - start < 1.5
+    assert indices == {}
+
+
+def test_timeout_stops_deleting_between_chunks(tmp_path):
+    app = application(tmp_path, chunk_delay=0.2)
+    client = app.clients["slow"]
+    start = time.perf_counter()
+    app.manage(delete=True)
+    assert time.perf_counter() - start < 1.5
+    time.sleep(0.5)  # the chunk in flight when the timeout hit finishes
+    removed = len(client.removed)
+    assert 0 < removed < 5
+    time.sleep(0.5)
+    assert len(client.removed) == removed
+
+
+def test_check_async_evicts_off_the_event_loop(tmp_path):
+    import asyncio
+
+    app = application(tmp_path, chunk_delay=0.3)
+    client = app.clients["slow"]
+    client.evict_on_demand = True
+    client.storage_cap = app.snapshot(client).client.size  # full
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        check = asyncio.ensure_future(app.check_async("slow", "aither", 1 << 30))
+        longest, last = 0.0, loop.time()
+        while not check.done():
+            await asyncio.sleep(0.01)
+            longest, last = max(longest, loop.time() - last), loop.time()
+        return await check, longest
+
+    (ok, _), longest = asyncio.run(run())
+    assert ok
+    assert client.removed
+    assert longest < 0.2
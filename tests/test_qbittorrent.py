@@ -0,0 +1,99 @@
+import pytest
+
+from benchmarks.fakes import FakeQBitTorrent, qbittorrent_torrent, synthetic_torrents
+from qbittorrent import QBitTorrentClient
+from snapshot import Snapshot
+
+
+@pytest.fixture
+def qbittorrent():
+    """A fake qBittorrent with 50 torrents across aither and tl."""
+    fake = FakeQBitTorrent(synthetic_torrents(50, ["aither", "tl"], ["automated"]))
+    yield fake.start()
+    fake.stop()
+
+
+def client(url: str, sync: bool) -> QBitTorrentClient:
+    return QBitTorrentClient(
+        "qbt",
+        {
+            "url": url,
+            "storage_cap_gb": 1 << 20,
+            "required_labels": ["automated"],
+            "sync": sync,
+        },
+    )
+
+
+def rows(snapshot: Snapshot) -> dict[str, tuple]:
+    columns = (
+        snapshot.name,
+        snapshot.started_at,
+        snapshot.finished_at,
+        snapshot.size,
+        snapshot.downloaded,
+        snapshot.uploaded,
+        snapshot.down_rate,
+        snapshot.up_rate,
+        snapshot.state,
+    )
+    return {
+        infohash: (sorted(snapshot.labels(row)),) + tuple(c[row] for c in columns)
+        for row, infohash in enumerate(snapshot.infohash)
+    }
+
+
+def test_sync_applies_deltas(qbittorrent):
+    synced, listed = client(qbittorrent.url, True), client(qbittorrent.url, False)
+    assert rows(synced.list_torrents()) == rows(listed.list_torrents())
+    hashes = list(qbittorrent.torrents)
+
+    qbittorrent.update(hashes[0], uploaded=123, upspeed=456, tags="automated, tl")
+    qbittorrent.update(hashes[1], completion_on=1700000000, state="uploading")
+    qbittorrent.remove(hashes[2])
+    added = synthetic_torrents(51, ["mam"], ["automated"], seed=1)[-1]
+    qbittorrent.add(qbittorrent_torrent(added))
+    # the delta carries the changed fields only
+    delta = qbittorrent.maindata(synced.rid)
+    assert delta["torrents"][hashes[0]] == {
+        "uploaded": 123,
+        "upspeed": 456,
+        "tags": "automated, tl",
+    }
+    assert delta["torrents_removed"] == [hashes[2]]
+
+    after = rows(synced.list_torrents())
+    assert after == rows(listed.list_torrents())
+    assert len(after) == 50
+    assert after[hashes[0]][0] == ["automated", "tl"]
+    assert after[hashes[1]][3] == 1700000000
+    assert hashes[2] not in after
+    assert added["hash"].lower() in after
+    assert qbittorrent.calls["sync/maindata"] == 2
+
+
+def test_sync_without_changes_keeps_the_state(qbittorrent):
+    synced = client(qbittorrent.url, True)
+    first = rows(synced.list_torrents())
+    assert qbittorrent.maindata(synced.rid)["torrents"] == {}
+    assert rows(synced.list_torrents()) == first
+
+
+def test_sync_full_update_replaces_the_state(qbittorrent):
+    synced = client(qbittorrent.url, True)
+    synced.list_torrents()
+    gone = next(iter(qbittorrent.torrents))
+    qbittorrent.remove(gone)
+    qbittorrent.removed.clear()  # e.g. a restart lost the removal history
+    synced.rid = qbittorrent.rid + 1  # unknown to the server, so it sends everything
+    after = rows(synced.list_torrents())
+    assert len(after) == 49
+    assert gone not in after
+
+
+def test_sync_logs_in_again_after_the_session_expires(qbittorrent):
+    synced = client(qbittorrent.url, True)
+    synced.list_torrents()
+    qbittorrent.update(next(iter(qbittorrent.torrents)), uploaded=1)
+    qbittorrent.expire_session()
+    assert len(synced.list_torrents()) == 50
@@ -0,0 +1,57 @@
+import time
+
+import pytest
+
+from reservations import ReservationLedger
+from snapshot import Snapshot
+from state import SharedReservationLedger, StateStore
+
+
+@pytest.fixture(params=["memory", "shared"])
+def ledger(request, tmp_path):
+    if request.param == "memory":
+        return ReservationLedger()
+    return SharedReservationLedger(
+        StateStore(str(tmp_path / "state.db"), 300, 1800, 86400)
+    )
+
+
+def test_settled_reservations_count_until_their_snapshot(ledger):
+    reservation = ledger.reserve("rt", "aither", "aither", 3 << 30, 30)
+    snapshot = Snapshot()
+    snapshot.append(
+        "A" * 40, "a", ["aither"], int(time.time()), 0, 3 << 30, 0, 0, 0, 0, "", ""
+    )
+    fetched_at = time.time()
+    ledger.reconcile("rt", snapshot, fetched_at)
+
+    assert ledger.pending("rt", "aither", fetched_at - 1).count == 1
+    assert ledger.pending("rt", "aither", fetched_at).count == 0
+    assert ledger.pending("rt", "aither").count == 0
+    # the torrent settled it already, so it doesn't settle the next one too
+    ledger.reserve("rt", "aither", "aither", 3 << 30, 30)
+    ledger.reconcile("rt", snapshot, fetched_at + 1)
+    assert ledger.pending("rt", "aither").count == 1
+    ledger.release(reservation)
+    assert ledger.pending("rt", "aither", fetched_at - 1).count == 1
+
+
+def test_settled_reservations_leave_the_totals_once_passed():
+    ledger = ReservationLedger()
+    snapshot = Snapshot()
+    now = time.time()
+    for i in range(100):
+        ledger.reserve("rt", "aither", "aither", (1 << 30) + i, 30)
+        snapshot.append(
+            f"{i:040X}", "a", ["aither"], int(now), 0, (1 << 30) + i, 0, 0, 0, 0, "", ""
+        )
+    ledger.reconcile("rt", snapshot, now)
+    ledger.reserve("rt", "aither", "aither", 5 << 30, 30)
+
+    assert ledger.pending("rt", "aither", now - 1).count == 101
+    assert ledger.pending("rt", "aither", now).count == 1
+    assert ledger.settling["rt"] == []
+    # dropped for good, an older snapshot coming back can't revive them
+    assert ledger.pending("rt", "aither", now - 1).count == 1
+    # still claiming their torrents
+    assert len(ledger.reservations) == 101
@@ -0,0 +1,76 @@
+import asyncio
+
+import pytest
+
+from benchmarks.fakes import FakeRTorrent, synthetic_torrents
+from rtorrent import RTorrentClient
+from scgi import SCGITransport
+
+
+@pytest.fixture(params=["tcp", "unix"])
+def scgi_rtorrent(request, tmp_path):
+    """A fake rTorrent served natively over SCGI, on TCP or a unix socket."""
+    socket_path = str(tmp_path / "rtorrent.sock") if request.param == "unix" else None
+    fake = FakeRTorrent(
+        synthetic_torrents(50, ["aither", "tl"], ["automated"]),
+        transport="scgi",
+        socket_path=socket_path,
+    )
+    yield fake.start()
+    fake.stop()
+
+
+def client(url: str) -> RTorrentClient:
+    return RTorrentClient(
+        "rt",
+        {"url": url, "storage_cap_gb": 1 << 20, "required_labels": ["automated"]},
+    )
+
+
+@pytest.mark.parametrize(
+    "url, address",
+    [
+        ("scgi:///run/rtorrent/rpc.sock", "/run/rtorrent/rpc.sock"),
+        ("scgi:///run/rtorrent%20a/rpc.sock", "/run/rtorrent a/rpc.sock"),
+        ("scgi://127.0.0.1:5000", ("127.0.0.1", 5000)),
+    ],
+)
+def test_transport_from_url(url, address):
+    assert SCGITransport.from_url(url).address == address
+
+
+@pytest.mark.parametrize(
+    "url", ["http://127.0.0.1:5000/RPC2", "scgi://127.0.0.1", "scgi://"]
+)
+def test_transport_rejects_bad_urls(url):
+    with pytest.raises(ValueError):
+        SCGITransport.from_url(url)
+
+
+def test_list_and_remove_over_scgi(scgi_rtorrent):
+    rt = client(scgi_rtorrent.url)
+    snapshot = rt.list_torrents()
+    assert len(snapshot) == 50
+    # sizes over 2 GiB arrive as i8
+    expected = {t["hash"]: t["size"] for t in scgi_rtorrent.torrents.values()}
+    assert {t.infohash: t.size for t in snapshot} == expected
+
+    removed = rt.remove_torrents(list(snapshot)[:3])
+    assert list(removed.values()) == [True] * 3
+    assert len(scgi_rtorrent.torrents) == 47
+    assert len(rt.list_torrents()) == 47
+
+
+def test_async_list_and_remove_over_scgi(scgi_rtorrent):
+    rt = client(scgi_rtorrent.url)
+
+    async def run():
+        snapshot = await rt.list_torrents_async()
+        removed = await rt.remove_torrents_async(list(snapshot)[:3])
+        await rt.aclose()
+        return snapshot, removed
+
+    snapshot, removed = asyncio.run(run())
+    assert len(snapshot) == 50
+    assert list(removed.values()) == [True] * 3
+    assert len(scgi_rtorrent.torrents) == 47
@@ -0,0 +1,134 @@
+import multiprocessing
+import threading
+import time
+
+import pytest
+
+from benchmarks.fakes import write_config
+
+CLIENT = "rt"
+LABEL = "aither"
+
+
+def downloading(fake, label: str) -> int:
+    return sum(
+        1
+        for t in fake.torrents.values()
+        if t["finished"] == 0 and label in t["labels"] and "automated" in t["labels"]
+    )
+
+
+def shared_config(directory: str, url: str, ttl: float, slots: int) -> str:
+    return write_config(
+        directory,
+        {CLIENT: {"type": "rtorrent", "url": url, "storage_cap_gb": 1 << 20}},
+        {LABEL: {"label": LABEL, "requirements": [], "download_slots": slots}},
+        {
+            "clients": {"snapshot_ttl_seconds": ttl, "reservation_ttl_seconds": 30},
+            "state": {"path": f"{directory}/state.db", "shared": True},
+        },
+    )
+
+
+def accepted_torrent(infohash: str, size: int) -> dict:
+    """The torrent a client starts downloading after its admission."""
+    return {
+        "hash": infohash,
+        "name": f"Accepted.{infohash}",
+        "labels": ["automated", LABEL],
+        "started": int(time.time()),
+        "finished": 0,
+        "size": size,
+        "downloaded": 0,
+        "uploaded": 0,
+        "down_rate": 0,
+        "up_rate": 0,
+        "message": "",
+    }
+
+
+def test_settled_reservations_count_for_older_snapshots(tmp_path, rtorrent):
+    from application import Application
+
+    slots = downloading(rtorrent, LABEL) + 1
+    config = shared_config(str(tmp_path), rtorrent.url, 60, slots)
+    a, b = Application(config), Application(config)
+    a.client(CLIENT).snapshot_ttl = 0  # lists the client on every check
+
+    ok, _ = b.check(CLIENT, LABEL, 3 << 30)
+    assert ok
+    rtorrent.add(accepted_torrent("A" * 40, 3 << 30))
+    # a's listing holds the torrent and settles the reservation
+    ok, _ = a.check(CLIENT, LABEL, 5 << 30)
+    assert not ok
+    # b's cached snapshot predates the torrent, so the reservation still counts
+    ok, err = b.check(CLIENT, LABEL, 5 << 30)
+    assert not ok
+    assert "Download slots exceeded" in err
+
+
+def test_invalidation_reaches_other_processes_caches(tmp_path, rtorrent):
+    from application import Application
+
+    config = shared_config(str(tmp_path), rtorrent.url, 60, 0)
+    a, b = Application(config), Application(config)
+    assert len(b.snapshot(b.client(CLIENT)).torrents) == 100
+    rtorrent.add(accepted_torrent("A" * 40, 3 << 30))
+    a.invalidate(CLIENT)
+    assert len(b.snapshot(b.client(CLIENT)).torrents) == 101
+
+
+def worker(config: str, index: int, duration: float, barrier, added, results):
+    """Check until the deadline, adding accepted torrents to the client."""
+    from application import Application
+
+    app = Application(config)
+    barrier.wait()
+    accepted = 0
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        size = (1 << 30) + (index << 20) + accepted
+        ok, _ = app.check(CLIENT, LABEL, size)
+        if ok:
+            added.put(accepted_torrent(f"{index:08X}{accepted:032X}", size))
+            accepted += 1
+        time.sleep(0.005)
+    app.logger.close()
+    results.put(accepted)
+
+
+@pytest.mark.skipif(
+    "fork" not in multiprocessing.get_all_start_methods(), reason="needs fork"
+)
+def test_processes_share_fetches_and_admissions(tmp_path, rtorrent):
+    workers, left, ttl, duration = 4, 5, 0.3, 3
+    config = shared_config(
+        str(tmp_path), rtorrent.url, ttl, downloading(rtorrent, LABEL) + left
+    )
+    context = multiprocessing.get_context("fork")
+    barrier = context.Barrier(workers)
+    added, results = context.Queue(), context.Queue()
+
+    def add():
+        for torrent in iter(added.get, None):
+            rtorrent.add(torrent)
+
+    adder = threading.Thread(target=add)
+    adder.start()
+    processes = [
+        context.Process(
+            target=worker, args=(config, i, duration, barrier, added, results)
+        )
+        for i in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    accepted = sum(results.get(timeout=60) for _ in processes)
+    for process in processes:
+        process.join()
+    added.put(None)
+    adder.join()
+
+    assert accepted == left
+    # one listing per TTL for all of them, give or take the edges
+    assert rtorrent.calls["d.multicall2"] <= duration / ttl + 2
@@ -2,6 +2,10 @@ from datetime import datetime
 
 
 class Torrent:
+    """A torrent, viewed as one row of a Snapshot."""
+
+    __slots__ = ("snapshot", "row")
+
     def __init__(
         self,
         infohash: str,
@@ -17,18 +21,94 @@ class Torrent:
         state: str,
         tracker_error: str | None,
     ):
-        self.infohash = infohash
-        self.name = name
-        self.labels = labels
-        self.started_at = started_at
-        self.finished_at = finished_at
-        self.size = size
-        self.downloaded = downloaded
-        self.uploaded = uploaded
-        self.down_rate = down_rate
-        self.up_rate = up_rate
-        self.state = state
-        self.tracker_error = tracker_error
+        from snapshot import Snapshot  # snapshot builds on this module
+
+        self.snapshot = Snapshot()
+        self.snapshot.append(
+            infohash,
+            name,
+            labels,
+            int(started_at.timestamp()),
+            int(finished_at.timestamp()) if finished_at else 0,
+            size,
+            downloaded,
+            uploaded,
+            down_rate,
+            up_rate,
+            state,
+            tracker_error,
+        )
+        self.row = 0
+
+    @classmethod
+    def view(cls, snapshot, row: int) -> "Torrent":
+        """Get a view of a snapshot row without copying it."""
+        torrent = cls.__new__(cls)
+        torrent.snapshot = snapshot
+        torrent.row = row
+        return torrent
+
+    @property
+    def infohash(self) -> str:
+        return self.snapshot.infohash[self.row]
+
+    @property
+    def name(self) -> str:
+        return self.snapshot.name[self.row]
+
+    @property
+    def labels(self) -> list[str]:
+        return self.snapshot.labels(self.row)
+
+    @property
+    def started_at(self) -> datetime:
+        return datetime.fromtimestamp(self.snapshot.started_at[self.row])
+
+    @property
+    def finished_at(self) -> datetime | None:
+        finished_at = self.snapshot.finished_at[self.row]
+        return datetime.fromtimestamp(finished_at) if finished_at > 0 else None
+
+    @property
+    def size(self) -> int:
+        return self.snapshot.size[self.row]
+
+    @property
+    def downloaded(self) -> int:
+        return self.snapshot.downloaded[self.row]
+
+    @property
+    def uploaded(self) -> int:
+        return self.snapshot.uploaded[self.row]
+
+    @property
+    def down_rate(self) -> float:
+        return self.snapshot.down_rate[self.row]
+
+    @property
+    def up_rate(self) -> float:
+        return self.snapshot.up_rate[self.row]
+
+    @property
+    def state(self) -> str:
+        return self.snapshot.state[self.row]
+
+    @property
+    def tracker_error(self) -> str | None:
+        return self.snapshot.tracker_error[self.row]
+
+    @tracker_error.setter
+    def tracker_error(self, value: str | None):
+        self.snapshot.tracker_error[self.row] = value
+
+    @property
+    def tracker_error_loaded(self) -> bool:
+        """Whether tracker_error reflects the tracker status, memoized per snapshot."""
+        return bool(self.snapshot.tracker_error_loaded[self.row])
+
+    @tracker_error_loaded.setter
+    def tracker_error_loaded(self, value: bool):
+        self.snapshot.tracker_error_loaded[self.row] = value
 
     def ratio(self) -> float:
         """Calculate the upload/download ratio."""
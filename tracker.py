@@ -1,5 +1,8 @@
-from datetime import datetime
+import time
 from client import Client
+from requirements import CompiledRequirements
+from reservations import Pending
+from snapshot_index import SnapshotIndex
 from torrent import Torrent
 
 
@@ -16,94 +19,95 @@ class Tracker:
         self.ratio_buffer = self.config.get("ratio_buffer", 0)
         self.seed_buffer_hours = self.config.get("seed_buffer_hours", 0)
         self.clear_errors = set(self.config.get("clear_errors", []))
+        # fails at startup on unknown requirements rather than mid-run
+        self.requirements = CompiledRequirements(
+            self.requirement_sets, self.ratio_buffer, self.seed_buffer_hours
+        )
 
-    def filter_torrents(self, client: Client, torrents: list[Torrent]) -> list[Torrent]:
-        """Filter torrents from this tracker."""
-        labels = client.required_labels.union([self.label])
-        return [
-            torrent
-            for torrent in torrents
-            if all(label in torrent.labels for label in labels)
-        ]
-
-    def list_torrents(self, client: Client) -> list[Torrent]:
-        """List torrents from this tracker."""
-        return self.filter_torrents(client, client.list_torrents())
+    def is_satisfied(self, torrent: Torrent, now: float | None = None) -> bool:
+        """Check if the torrent satisfies the tracker's requirements at epoch time now."""
+        return self.requirements.is_satisfied(
+            torrent, time.time() if now is None else now
+        )
 
-    def evaluate_requirement(self, torrent: Torrent, name: str, value: int) -> bool:
-        """Evaluate a requirement for a torrent."""
-        if name == "min_seed_ratio":
-            return torrent.ratio() >= value + self.ratio_buffer
-        elif name == "min_seed_hours":
-            age = (datetime.now() - torrent.finished_at).total_seconds() / 3600
-            return age >= value + self.seed_buffer_hours
-        else:
-            raise ValueError(f"Unknown requirement: {name}")
+    def can_accept(
+        self,
+        client: Client,
+        size: int,
+        index: SnapshotIndex | None = None,
+        pending: Pending | None = None,
+    ) -> tuple[bool, str]:
+        """Check if the tracker can accept the torrent. Returns success and error message.
 
-    def is_satisfied(self, torrent: Torrent) -> bool:
-        """Check if the torrent satisfies the tracker's requirements."""
-        return torrent.finished_at is not None and any(
-            all(
-                self.evaluate_requirement(torrent, name, value)
-                for name, value in reqs.items()
-            )
-            for reqs in self.requirement_sets
-        )
+        Pass index to evaluate against an existing client snapshot instead of fetching one.
+        Capacity in pending is counted as if its torrents were already in the client.
+        """
+        ok, _, msg = self.admit(client, size, index, pending)
+        return ok, msg
 
-    def can_accept(self, client: Client, size: int) -> tuple[bool, str]:
-        """Check if the tracker can accept the torrent. Returns success and error message."""
-        all_torrents = self.list_torrents(client)
-        client_torrents = client.filter(client.list_torrents())
-        size_total = sum(torrent.size for torrent in client_torrents) + size
+    def admit(
+        self,
+        client: Client,
+        size: int,
+        index: SnapshotIndex | None = None,
+        pending: Pending | None = None,
+    ) -> tuple[bool, str, str]:
+        """Like can_accept, with the reason code of the outcome in between."""
+        if index is None:
+            index = SnapshotIndex(client, client.list_torrents(), [self])
+        if pending is None:
+            pending = Pending()
+        size_total = index.client.size + pending.client_size + size
         if size_total > client.storage_cap:
             return (
                 False,
+                "client_storage",
                 f"Storage cap exceeded (client): {size_total / (1 << 30):.02f}/{client.storage_cap / (1 << 30):.02f} GiB.",
             )
-        torrents = self.filter_torrents(client, client_torrents)
+        stats = index.trackers[self.name]
         if self.storage_cap > 0:
-            consumed = sum(torrent.size for torrent in torrents) + size
+            consumed = stats.size + pending.size + size
             if consumed > self.storage_cap:
                 return (
                     False,
+                    "tracker_storage",
                     f"Storage cap exceeded (tracker): {consumed / (1 << 30):.02f}/{self.storage_cap / (1 << 30):.02f} GiB.",
                 )
         if self.unsatisfied_cap > 0:
-            unsatisfied_torrents = [
-                torrent for torrent in torrents if not self.is_satisfied(torrent)
-            ]
-            if len(unsatisfied_torrents) >= self.unsatisfied_cap:
+            unsatisfied = stats.unsatisfied + pending.count
+            if unsatisfied >= self.unsatisfied_cap:
                 return (
                     False,
-                    f"Unsatisfied cap exceeded: {unsatisfied_torrents}/{self.unsatisfied_cap}.",
+                    "unsatisfied_cap",
+                    f"Unsatisfied cap exceeded: {unsatisfied}/{self.unsatisfied_cap}.",
                 )
         if self.download_slots > 0:
-            downloading = [
-                torrent for torrent in torrents if torrent.finished_at is None
-            ]
-            if len(downloading) >= self.download_slots:
-                return (
-                    False,
-                    f"Download slots exceeded: {len(downloading)}/{self.download_slots}.",
-                )
-        if client.up_rate_cap > 0:
-            # use all torrents as they share the same network interface
-            up_rate = sum(torrent.up_rate for torrent in all_torrents)
-            if up_rate >= client.up_rate_cap:
-                return (
-                    False,
-                    f"Up rate cap exceeded: {up_rate / 1e6:.02f} Mbps.",
-                )
-        if client.down_rate_cap > 0:
-            # use all torrents as they share the same network interface
-            down_rate = sum(torrent.down_rate for torrent in all_torrents)
-            if down_rate >= client.down_rate_cap:
+            downloading = stats.downloading + pending.count
+            if downloading >= self.download_slots:
                 return (
                     False,
-                    f"Down rate cap exceeded: {down_rate / 1e6:.02f} Mbps.",
+                    "download_slots",
+                    f"Download slots exceeded: {downloading}/{self.download_slots}.",
                 )
-        return True, "OK"
+        if client.up_rate_cap > 0 and index.up_rate >= client.up_rate_cap:
+            return (
+                False,
+                "up_rate_cap",
+                f"Up rate cap exceeded: {index.up_rate / 1e6:.02f} Mbps.",
+            )
+        if client.down_rate_cap > 0 and index.down_rate >= client.down_rate_cap:
+            return (
+                False,
+                "down_rate_cap",
+                f"Down rate cap exceeded: {index.down_rate / 1e6:.02f} Mbps.",
+            )
+        return True, "ok", "OK"
 
     def is_faulted(self, client: Client, torrent: Torrent) -> bool:
         """Check if the torrent has a fatal tracker error and can be deleted."""
-        return client.is_faulted(torrent) and torrent.tracker_error in self.clear_errors
+        # without clear_errors nothing can match, so skip the (possibly remote) lookup
+        return (
+            bool(self.clear_errors)
+            and client.is_faulted(torrent)
+            and torrent.tracker_error in self.clear_errors
+        )